@@ -0,0 +1,439 @@
+"""
+Search engine for the baseline player: iterative-deepening alpha-beta
+(negamax) with a transposition table, move ordering (transposition table
+move, killer moves, then cells ranked by two-distance potential) and a
+two-distance evaluation.
+
+Positions are kept as a pair of integer bitboards (red, blue), with cell
+(r, q) at bit r * n + q. Red connects rows r = 0 and r = n - 1, and blue
+connects columns q = 0 and q = n - 1.
+
+The two-distance from a board edge to an empty cell is 1 if the cell
+touches the edge, otherwise one more than the second-smallest two-distance
+among its neighbours (so an opponent can't cut it off by blocking the
+single best route). A player's own tokens are free to pass through, and
+the opponent's are impassable. The potential of a cell is the sum of its
+two-distances to both of the player's edges, and the smaller a player's
+best potential, the closer they are to connecting.
+"""
+
+import time
+from random import Random
+from functools import lru_cache
+from collections import namedtuple
+
+# Colours (bitboard indices)
+RED, BLUE = 0, 1
+
+# Move value for STEAL (other moves are flat cell indices)
+STEAL = -1
+
+# Score of a won position (less the number of moves taken to win it)
+WIN = 1 << 20
+
+# Transposition table entry flags
+_EXACT, _LOWER, _UPPER = 0, 1, 2
+
+# Limit on transposition table entries (the table is cleared when full)
+_TABLE_SIZE = 1 << 18
+
+# Number of candidate moves searched at each node (after the table move
+# and killer moves), ranked by potential; the root considers twice as many
+_BRANCHING = 10
+
+# Placement record for undoing a move: the cell played, the bitboard of
+# tokens it captured, the Zobrist hash before the move, and whether the
+# move won the game
+Undo = namedtuple("Undo", "move captured zobrist won")
+
+
+class Timeout(Exception):
+    """Raised inside a search once its deadline has passed."""
+
+
+@lru_cache(maxsize=None)
+def geometry(n):
+    """
+    Pre-compute (and cache per board size) the board geometry:
+
+    * neighbours[i] is a list of the cells adjacent to cell i.
+    * captures[i] is a list of (opposite bit, mid cells mask) pairs, one per
+      diamond capture pattern made by placing in cell i.
+    * edges[colour] is a pair of masks of the two edges colour connects.
+    * transpose[i] is the cell mirrored from cell i along the major axis.
+    * zobrist[colour][i] is a random 64-bit key for a token in cell i.
+    """
+    steps = [(1, -1), (1, 0), (0, 1), (-1, 1), (-1, 0), (0, -1)]
+    inside = lambda r, q: 0 <= r < n and 0 <= q < n
+    neighbours, captures = [], []
+    for r in range(n):
+        for q in range(n):
+            neighbours.append([(r + dr) * n + q + dq for dr, dq in steps
+                if inside(r + dr, q + dq)])
+            patterns = []
+            for k, (r1, q1) in enumerate(steps):
+                for r2, q2 in (steps[k - 1], steps[k - 2]):
+                    cells = [(r + r1 + r2, q + q1 + q2), (r + r1, q + q1),
+                        (r + r2, q + q2)]
+                    if all(inside(*cell) for cell in cells):
+                        bits = [1 << (cr * n + cq) for cr, cq in cells]
+                        patterns.append((bits[0], bits[1] | bits[2]))
+            captures.append(patterns)
+    row = (1 << n) - 1
+    column = sum(1 << (r * n) for r in range(n))
+    edges = ((row, row << (n * (n - 1))), (column, column << (n - 1)))
+    transpose = [q * n + r for r in range(n) for q in range(n)]
+    rng = Random(n)
+    zobrist = [[rng.getrandbits(64) for _ in range(n * n)] for _ in range(2)]
+    return neighbours, captures, edges, transpose, zobrist
+
+
+def _cells(bits):
+    """
+    Generate the cells set in a bitboard.
+    """
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class Position:
+    """
+    A Cachex game state (tokens, and the number of turns played), with
+    moves made and taken back incrementally.
+    """
+
+    def __init__(self, n):
+        self.n = n
+        self.bits = [0, 0]
+        self.nturns = 0
+        self.zobrist = 0
+        (self._neighbours, self._captures, self._edges, self._transpose,
+            self._keys) = geometry(n)
+        self._full = (1 << (n * n)) - 1
+
+    @property
+    def colour(self):
+        """Colour to move."""
+        return self.nturns % 2
+
+    @property
+    def key(self):
+        """Hash of the position (tokens and colour to move)."""
+        return self.zobrist ^ self.colour
+
+    def empty(self):
+        """Bitboard of the empty cells."""
+        return self._full & ~(self.bits[RED] | self.bits[BLUE])
+
+    def moves(self):
+        """
+        List the legal moves (cells, and STEAL on the second turn).
+        """
+        empty = self.empty()
+        if self.nturns == 0 and self.n % 2 == 1:
+            empty &= ~(1 << (self.n * self.n // 2))
+        moves = list(_cells(empty))
+        if self.nturns == 1:
+            moves.append(STEAL)
+        return moves
+
+    def play(self, move):
+        """
+        Make a move for the colour to move, returning an Undo record.
+        """
+        colour = self.colour
+        zobrist = self.zobrist
+        self.nturns += 1
+        if move == STEAL:
+            self._swap()
+            return Undo(move, 0, zobrist, False)
+        own, other = colour, 1 - colour
+        bits = self.bits
+        bits[own] |= 1 << move
+        self.zobrist ^= self._keys[own][move]
+        captured = 0
+        for opposite, mid in self._captures[move]:
+            if bits[own] & opposite and bits[other] & mid == mid:
+                captured |= mid
+        if captured:
+            bits[other] &= ~captured
+            for cell in _cells(captured):
+                self.zobrist ^= self._keys[other][cell]
+        won = self.nturns >= 2 * self.n - 1 and self.connects(own)
+        return Undo(move, captured, zobrist, won)
+
+    def undo(self, undo):
+        """
+        Take back the last move, given its Undo record.
+        """
+        self.nturns -= 1
+        if undo.move == STEAL:
+            self._swap()
+        else:
+            own = self.colour
+            self.bits[own] &= ~(1 << undo.move)
+            self.bits[1 - own] |= undo.captured
+        self.zobrist = undo.zobrist
+
+    def _swap(self):
+        """
+        Mirror the tokens along the major axis, swapping their colours.
+        """
+        swapped = [0, 0]
+        for colour in (RED, BLUE):
+            for cell in _cells(self.bits[colour]):
+                swapped[1 - colour] |= 1 << self._transpose[cell]
+        self.bits = swapped
+        self.zobrist = 0
+        for colour in (RED, BLUE):
+            for cell in _cells(swapped[colour]):
+                self.zobrist ^= self._keys[colour][cell]
+
+    def connects(self, colour):
+        """
+        True iff colour's tokens connect both of its edges.
+        """
+        bits = self.bits[colour]
+        low, high = self._edges[colour]
+        reach = frontier = bits & low
+        while frontier:
+            grown = 0
+            for cell in _cells(frontier):
+                for adj in self._neighbours[cell]:
+                    grown |= 1 << adj
+            frontier = grown & bits & ~reach
+            reach |= frontier
+        return bool(reach & high)
+
+
+class Search:
+    """
+    Iterative-deepening alpha-beta search over Positions, keeping its
+    transposition table, killer moves and statistics between searches.
+    """
+
+    def __init__(self, n):
+        self.n = n
+        self.table = {}
+        self.killers = {}
+        self.nodes = 0
+        self.depth = 0
+        self.deadline = None
+        self._neighbours, _, self._edges, _, _ = geometry(n)
+
+    def choose(self, position, soft_limit, hard_limit):
+        """
+        Choose a move, deepening the search until soft_limit seconds have
+        passed (checked between iterations) or hard_limit seconds have
+        passed (checked during them, abandoning the unfinished iteration).
+        """
+        start = time.perf_counter()
+        self.deadline = start + hard_limit
+        self.nodes = 0
+        self.killers.clear()
+        moves = position.moves()
+        best = moves[0]
+        depth = 0
+        saved = list(position.bits), position.nturns, position.zobrist
+        while depth < len(moves):
+            depth += 1
+            try:
+                _, move = self._root(position, depth)
+            except Timeout:
+                # (moves made by the abandoned search were not undone)
+                position.bits, position.nturns, position.zobrist = saved
+                break
+            best = move
+            self.depth = depth
+            if time.perf_counter() - start > soft_limit / 2:
+                # (the next iteration is unlikely to finish in time)
+                break
+        return best
+
+    def _root(self, position, depth):
+        """
+        Search the root position to a fixed depth, returning the best score
+        and move.
+        """
+        score = self._negamax(position, depth, -WIN - 1, WIN + 1, 0)
+        return score, self.table[position.key][3]
+
+    def _negamax(self, position, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes & 63 == 0 and time.perf_counter() > self.deadline:
+            raise Timeout()
+
+        key = position.key
+        entry = self.table.get(key)
+        table_move = None
+        if entry is not None:
+            entry_depth, value, flag, table_move = entry
+            if entry_depth >= depth and ply > 0:
+                if flag == _EXACT:
+                    return value
+                if flag == _LOWER:
+                    alpha = max(alpha, value)
+                elif flag == _UPPER:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+
+        score, own, other = self._analyse(position)
+        if depth == 0:
+            return score
+
+        # Cells that matter most to both players are searched first
+        ranked = sorted(own, key=lambda cell: own[cell] + other[cell])
+        moves = self._order(position, ranked, table_move, ply)
+        original_alpha = alpha
+        best, best_move = -WIN - 1, moves[0]
+        for move in moves:
+            undo = position.play(move)
+            if undo.won:
+                value = WIN - ply - 1
+            else:
+                value = -self._negamax(position, depth - 1, -beta, -alpha,
+                    ply + 1)
+            position.undo(undo)
+            if value > best:
+                best, best_move = value, move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                killers = self.killers.setdefault(ply, [])
+                if move not in killers:
+                    killers.insert(0, move)
+                    del killers[2:]
+                break
+
+        if best <= original_alpha:
+            flag = _UPPER
+        elif best >= beta:
+            flag = _LOWER
+        else:
+            flag = _EXACT
+        if len(self.table) >= _TABLE_SIZE:
+            self.table.clear()
+        self.table[key] = (depth, best, flag, best_move)
+        return best
+
+    def _order(self, position, ranked, table_move, ply):
+        """
+        Order (and select) the moves to search at a node: the table move
+        first, then killer moves, then the best-ranked cells.
+        """
+        legal = set(position.moves())
+        width = _BRANCHING * (2 if ply == 0 else 1)
+        moves = []
+        for move in [table_move, *self.killers.get(ply, ())]:
+            if move in legal and move not in moves:
+                moves.append(move)
+        if STEAL in legal and STEAL not in moves:
+            moves.append(STEAL)
+        for move in ranked:
+            if len(moves) >= width:
+                break
+            if move in legal and move not in moves:
+                moves.append(move)
+        return moves
+
+    def evaluate(self, position):
+        """
+        Evaluate a position for the colour to move: the difference in the
+        players' best two-distance potentials (and then in the number of
+        cells achieving them).
+        """
+        return self._analyse(position)[0]
+
+    def _analyse(self, position):
+        """
+        Evaluate a position (see evaluate), also returning the potentials
+        of each empty cell for the colour to move and for its opponent.
+        """
+        colour = position.colour
+        own, own_count = self._potentials(position, colour)
+        other, other_count = self._potentials(position, 1 - colour)
+        own_best = min(own.values(), default=0)
+        other_best = min(other.values(), default=0)
+        score = 100 * (other_best - own_best) + own_count - other_count
+        return score, own, other
+
+    def _potentials(self, position, colour):
+        """
+        Two-distance potentials (see module docstring) of each empty cell
+        for a colour, and the number of cells with the best potential.
+        """
+        n, neighbours = self.n, self._neighbours
+        own = position.bits[colour]
+        empty = position.empty()
+        low, high = self._edges[colour]
+
+        # Cells reachable in one step from each empty cell, treating each
+        # group of own tokens as a single node adjacent to all its empty
+        # neighbours (and to the edges it touches)
+        group_of = {}
+        groups = []
+        for cell in _cells(own):
+            if cell in group_of:
+                continue
+            members, liberties, stack = 0, set(), [cell]
+            group_of[cell] = len(groups)
+            while stack:
+                member = stack.pop()
+                members |= 1 << member
+                for adj in neighbours[member]:
+                    if own >> adj & 1 and adj not in group_of:
+                        group_of[adj] = len(groups)
+                        stack.append(adj)
+                    elif empty >> adj & 1:
+                        liberties.add(adj)
+            groups.append((liberties, bool(members & low),
+                bool(members & high)))
+
+        steps = {}
+        touches = ([], [])
+        for cell in _cells(empty):
+            reach = set()
+            on_low, on_high = low >> cell & 1, high >> cell & 1
+            for adj in neighbours[cell]:
+                if empty >> adj & 1:
+                    reach.add(adj)
+                elif adj in group_of:
+                    liberties, group_low, group_high = groups[group_of[adj]]
+                    reach |= liberties
+                    on_low |= group_low
+                    on_high |= group_high
+            reach.discard(cell)
+            steps[cell] = reach
+            if on_low:
+                touches[0].append(cell)
+            if on_high:
+                touches[1].append(cell)
+
+        # Two-distances from each edge, a layer at a time: a cell joins
+        # the next layer once two of its neighbours are in earlier ones
+        infinity = 2 * n * n
+        potentials = dict.fromkeys(steps, 0)
+        for layer in touches:
+            distance = dict.fromkeys(layer, 1)
+            hits = {}
+            k = 1
+            while layer:
+                k += 1
+                following = []
+                for cell in layer:
+                    for adj in steps[cell]:
+                        if adj in distance:
+                            continue
+                        hits[adj] = hits.get(adj, 0) + 1
+                        if hits[adj] == 2:
+                            distance[adj] = k
+                            following.append(adj)
+                layer = following
+            for cell in potentials:
+                potentials[cell] += distance.get(cell, infinity)
+
+        best = min(potentials.values(), default=0)
+        count = sum(1 for value in potentials.values() if value == best)
+        return potentials, count
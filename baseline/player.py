@@ -0,0 +1,83 @@
+"""
+A reference Cachex player, to benchmark other players against (for
+strength and for speed). It searches with the engine in baseline.engine,
+spreading a per-game time budget over its moves.
+"""
+
+import time
+
+from baseline.engine import Position, Search, STEAL, RED, BLUE
+
+_COLOURS = {"red": RED, "blue": BLUE}
+
+
+class Player:
+    # Total (wall-clock) time to spend thinking over a game, in seconds.
+    # The referee's own wall-clock budget (time_remaining) also applies
+    TIME_BUDGET = 60.0
+
+    # Fraction of the remaining budget kept back as a safety margin
+    RESERVE = 0.1
+
+    def __init__(self, player, n):
+        """
+        Called once at the beginning of a game to initialise this player.
+        Set up an internal representation of the game state.
+
+        The parameter player is the string "red" if your player will
+        play as Red, or the string "blue" if your player will play
+        as Blue.
+        """
+        self.colour = _COLOURS[player]
+        self.n = n
+        self.position = Position(n)
+        self.search = Search(n)
+        self.time_used = 0.0
+        self.time_remaining = None
+
+    def action(self):
+        """
+        Called at the beginning of your turn. Based on the current state
+        of the game, select an action to play.
+        """
+        start = time.perf_counter()
+        soft_limit, hard_limit = self._allocate()
+        move = self.search.choose(self.position, soft_limit, hard_limit)
+        self.time_used += time.perf_counter() - start
+        if move == STEAL:
+            return ("STEAL",)
+        return ("PLACE", *divmod(move, self.n))
+
+    def turn(self, player, action):
+        """
+        Called at the end of each player's turn to inform this player of
+        their chosen action. Update your internal representation of the
+        game state based on this. The parameter action is the chosen
+        action itself.
+
+        Note: At the end of your player's turn, the action parameter is
+        the same as what your player returned from the action method
+        above. However, the referee has validated it at this point.
+        """
+        atype, *aargs = action
+        if atype == "STEAL":
+            self.position.play(STEAL)
+        else:
+            r, q = aargs
+            self.position.play(r * self.n + q)
+
+    def _allocate(self):
+        """
+        Time limits (soft, hard) for the next move: an even share of the
+        remaining budget over the moves likely to be left in the game, and
+        a hard stop at twice that (but never more than half of what is
+        left).
+        """
+        remaining = self.TIME_BUDGET - self.time_used
+        if self.time_remaining is not None:
+            remaining = min(remaining, self.time_remaining)
+        remaining *= 1 - self.RESERVE
+        empty = bin(self.position.empty()).count("1")
+        moves_left = max(empty // 2, 4)
+        soft_limit = remaining / moves_left
+        return soft_limit, min(2 * soft_limit, remaining / 2)
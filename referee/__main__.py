@@ -1,3 +1,21 @@
-from referee.main import main
+import sys
 
-main()
+# Sub-commands (python -m referee <command> ...) and their modules. Without
+# a recognised command, play a single game (see referee.main).
+_COMMANDS = {
+    "tournament": "referee.tournament",
+    "replay": "referee.replay",
+    "serve": "referee.protocol",
+    "telemetry": "referee.telemetry",
+    "tablebase": "referee.tablebase",
+}
+
+if len(sys.argv) > 1 and sys.argv[1] in _COMMANDS:
+    import importlib
+
+    command = importlib.import_module(_COMMANDS[sys.argv[1]])
+    command.main(sys.argv[2:])
+else:
+    from referee.main import main
+
+    main()
@@ -0,0 +1,554 @@
+"""
+Micro-benchmarks for hot paths in the referee, comparing the current
+implementation against the original (reference) implementation it
+replaced. Run with:
+
+    python -m referee.benchmark [name ...]
+
+where each name is one of the benchmarks listed in BENCHMARKS (default:
+run all of them). The "parity" benchmark also checks that the bitboard
+backend (referee.bitboard) behaves exactly like the NumPy Board, and
+fails (raising AssertionError) at the first ply where they differ. The
+"limits" benchmark checks that players (including asynchronous ones) who
+run out of wall-clock time forfeit the game, and reports how quickly.
+The "legal" benchmark checks Game.legal_actions against a scan of the
+board, on games and on deep copies of them played on independently.
+"""
+
+import os
+import sys
+import copy
+import time
+import random
+import socket
+import asyncio
+import tempfile
+import threading
+from itertools import islice
+
+from referee.board import Board, _CAPTURE_PATTERNS, _SWAP_PLAYER, _ADD
+from referee.bitboard import BitBoard
+from referee.log import config
+from referee.game import Game, _RENDER, play, play_async
+from referee.player import PlayerWrapper, ResourceLimitException
+from referee.protocol import AsyncSocketPlayerWrapper, serve, parse_address
+from referee.game import _RED_SYM, _BLUE_SYM, _CAPTURE_SYM, _POINT_TO, _STAR_TO
+
+
+def _time(fn, cases, repeat):
+    """
+    Best-of-`repeat` wall time (seconds) to call fn on every case.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for case in cases:
+            fn(*case)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _report(name, ncalls, old, new):
+    print(
+        f"{name}: {ncalls} calls | "
+        f"old {old / ncalls * 1e6:8.2f}us/call | "
+        f"new {new / ncalls * 1e6:8.2f}us/call | "
+        f"speedup {old / new:5.2f}x"
+    )
+
+
+def _random_board(n, rng, fill=0.6):
+    """
+    Board with roughly `fill` of its cells holding random tokens.
+    """
+    board = Board(n)
+    for r in range(n):
+        for q in range(n):
+            if rng.random() < fill:
+                board._data[r, q] = rng.choice((1, 2))
+    return board
+
+
+# # #
+# Capture checking
+#
+
+def _legacy_apply_captures(board, coord):
+    """
+    Original Board._apply_captures (builds coordinate tuples for each of
+    the 12 capture patterns on every call).
+    """
+    opp_type = board._data[coord]
+    mid_type = _SWAP_PLAYER[opp_type]
+    captured = set()
+    for pattern in _CAPTURE_PATTERNS:
+        coords = [_ADD(coord, s) for s in pattern]
+        if all(map(board.inside_bounds, coords)):
+            tokens = [board._data[coord] for coord in coords]
+            if tokens == [opp_type, mid_type, mid_type]:
+                captured.update(coords[1:])
+    for coord in captured:
+        board[coord] = None
+    return list(captured)
+
+
+def bench_captures(n=11, positions=500, repeat=5, seed=0):
+    """
+    Capture checking throughput on random positions (each call restores the
+    position first, so both implementations see identical inputs).
+    """
+    rng = random.Random(seed)
+    cases = []
+    for _ in range(positions):
+        board = _random_board(n, rng)
+        coord = (rng.randrange(n), rng.randrange(n))
+        board._data[coord] = rng.choice((1, 2))
+        cases.append((board, board._data.copy(), coord))
+
+    def old(board, data, coord):
+        board._data[:] = data
+        _legacy_apply_captures(board, coord)
+
+    def new(board, data, coord):
+        board._data[:] = data
+        board._apply_captures(coord)
+
+    _report(f"captures (n={n})", positions,
+        _time(old, cases, repeat), _time(new, cases, repeat))
+
+
+# # #
+# Board rendering
+#
+
+def _legacy_render(
+    game,
+    message="",
+    use_debugboard=False,
+    use_colour=False,
+    use_unicode=False,
+):
+    """
+    Original game._RENDER (rebuilds stitching through a generator and looks
+    up each cell through Board.__getitem__, twice, on every call).
+    """
+    board = game.board
+
+    # Should we use 😂 ?
+    _symbol_map = {}
+    if use_unicode:
+        _symbol_map = {
+            _RED_SYM: " 🍓  ",
+            _BLUE_SYM: " 🍇  ",
+            _POINT_TO(_RED_SYM): "▶🍓◀ ",
+            _POINT_TO(_BLUE_SYM): "▶🍇◀ ",
+            _STAR_TO(_RED_SYM): "⯌🍓⯌ ",
+            _STAR_TO(_BLUE_SYM): "⯌🍇⯌ ",
+            _CAPTURE_SYM: " 🐸  "
+        }
+
+    stitch_pattern = ".-'-._"
+    edge_col_len = 3
+    v_divider = "|"
+    h_spacing = len(stitch_pattern)
+    output = message + "\n"
+
+    if use_debugboard:
+        output += "DEBUG: Captured coords: "
+        output += str(game.last_captures)
+        output += "\n\n"
+
+    # Helper functions to apply ansi formatting (selectively)
+    def _apply_ansi(str, bold=True, color=None):
+        bold_code = "\033[1m" if bold else ""
+        color_code = ""
+        if color == "r":
+            color_code = "\033[31m"
+        if color == "b":
+            color_code = "\033[34m"
+        return f"{bold_code}{color_code}{str}\033[0m"
+
+    apply_ansi = _apply_ansi if use_colour else lambda str, **_: str
+
+    # Generator to repeat pattern string (char by char) infinitely
+    def repeat(pattern):
+        while True:
+            for c in pattern:
+                yield c
+
+    # Generate stitching pattern given some offset and length
+    def stitching(offset, length):
+        return "".join(islice(repeat(stitch_pattern), offset, length))
+
+    # Loop through each row i from top (print ordering)
+    # Note that n - i - 1 is equivalent to r in axial coordinates
+    for i in range(board.n):
+        x_padding = (board.n - i - 1) * int(h_spacing / 2)
+        stitch_length = (board.n * h_spacing) - 1 + \
+            (int(h_spacing / 2) + 1 if i > 0 else 0)
+        mid_stitching = stitching(0, stitch_length)
+
+        # Handle coloured borders for ansi outputs
+        # Fairly ugly code, but there is no "simple" solution
+        if i == 0:
+            mid_stitching = apply_ansi(mid_stitching, color="r")
+        else:
+            mid_stitching = \
+                apply_ansi(mid_stitching[:edge_col_len], color="b") + \
+                mid_stitching[edge_col_len:-edge_col_len] + \
+                apply_ansi(mid_stitching[-edge_col_len:], color="b")
+
+        output += " " * (x_padding + 1) + mid_stitching + "\n"
+        output += " " * x_padding + apply_ansi(v_divider, color="b")
+
+        # Loop through each column j from left to right
+        # Note that j is equivalent to q in axial coordinates
+        for j in range(board.n):
+            coord = (board.n - i - 1, j)
+            color = value = "" if board[coord] == None else \
+                (_RED_SYM if board[coord] == "red" else _BLUE_SYM)
+            if use_debugboard:
+                if coord == game.last_coord:
+                    value = _POINT_TO(value)
+                elif coord in game.result_cluster:
+                    value = _STAR_TO(value)
+                if coord in game.last_captures:
+                    value = _CAPTURE_SYM
+            contents = _symbol_map.get(value) or value.center(h_spacing - 1)
+            contents = apply_ansi(contents, color=color)
+            output += contents + (v_divider if j < board.n - 1 else "")
+        output += apply_ansi(v_divider, color="b")
+        output += "\n"
+    
+    # Final/lower stitching (note use of offset here)
+    stitch_length = (board.n * h_spacing) + int(h_spacing / 2)
+    lower_stitching = stitching(int(h_spacing / 2) - 1, stitch_length)
+    output += apply_ansi(lower_stitching, color="r") + "\n"
+
+    return output
+
+
+def bench_render(n=12, positions=50, repeat=5, seed=0):
+    """
+    Board rendering throughput on random positions, for every combination
+    of display options.
+    """
+    rng = random.Random(seed)
+    cases = []
+    for _ in range(positions):
+        game = Game(n)
+        game.board = _random_board(n, rng)
+        game.last_coord = (rng.randrange(n), rng.randrange(n))
+        for use_debugboard in (False, True):
+            for use_colour in (False, True):
+                for use_unicode in (False, True):
+                    cases.append(
+                        (game, use_debugboard, use_colour, use_unicode)
+                    )
+
+    def old(game, use_debugboard, use_colour, use_unicode):
+        _legacy_render(game, "", use_debugboard, use_colour, use_unicode)
+
+    def new(game, use_debugboard, use_colour, use_unicode):
+        _RENDER(game, "", use_debugboard, use_colour, use_unicode)
+
+    _report(f"render (n={n})", len(cases),
+        _time(old, cases, repeat), _time(new, cases, repeat))
+
+
+# # #
+# Board backend parity
+#
+
+def _compare_boards(board, bitboard, where, starts):
+    """
+    Check that two boards (of any backends) hold the same state: cells,
+    winning paths and Zobrist hash, and the regions connected to each of
+    the start coords.
+    """
+    def check(what, expected, actual):
+        if expected != actual:
+            raise AssertionError(
+                f"{where}: {what} differ: {expected!r} != {actual!r}"
+            )
+
+    check("cells", list(board.token_types()), bitboard.token_types())
+    check("hashes", board.zobrist, bitboard.zobrist)
+    check("recomputed hashes", board.zobrist_full(), bitboard.zobrist_full())
+    for token in ("red", "blue"):
+        check(f"{token} connections", board.connects_edges(token),
+            bitboard.connects_edges(token))
+    for coord in starts:
+        check(f"regions connected to {coord}",
+            sorted(map(tuple, board.connected_coords(coord))),
+            sorted(bitboard.connected_coords(coord)))
+
+
+def bench_parity(sizes=(2, 3, 4, 5, 7), games=20, seed=0):
+    """
+    Play random games (of random legal placements, with a STEAL on the
+    second turn half of the time) on a Board and a BitBoard side by side,
+    comparing captures after every placement and the whole board state
+    after every ply (connected regions from the cell just played, any
+    captured cells and a couple of random cells), and time both backends.
+    """
+    rng = random.Random(seed)
+    plies = 0
+    elapsed = {Board: 0.0, BitBoard: 0.0}
+    for n in sizes:
+        for game in range(games):
+            boards = {Board: Board(n), BitBoard: BitBoard(n)}
+            empty = [(r, q) for r in range(n) for q in range(n)]
+            for ply in range(n * n * 2):
+                where = f"n={n}, game {game}, ply {ply + 1}"
+                token = ("red", "blue")[ply % 2]
+                if ply == 1 and rng.random() < 0.5:
+                    action = "STEAL"
+                    empty = [(q, r) for r, q in empty]
+                else:
+                    action = empty.pop(rng.randrange(len(empty)))
+                captures = {}
+                for cls, board in boards.items():
+                    start = time.perf_counter()
+                    if action == "STEAL":
+                        board.swap()
+                    else:
+                        captures[cls] = board.place(token, action).captured
+                    elapsed[cls] += time.perf_counter() - start
+                if captures:
+                    if sorted(map(tuple, captures[Board])) \
+                            != sorted(captures[BitBoard]):
+                        raise AssertionError(f"{where}: captures differ: "
+                            f"{captures[Board]!r} != {captures[BitBoard]!r}")
+                    empty.extend(captures[BitBoard])
+                starts = [(rng.randrange(n), rng.randrange(n))
+                    for _ in range(2)]
+                if action != "STEAL":
+                    starts += [action] + captures[BitBoard]
+                _compare_boards(boards[Board], boards[BitBoard], where,
+                    starts)
+                plies += 1
+                if not empty or boards[Board].connects_edges(token):
+                    break
+
+    _report(f"parity (n in {list(sizes)}, {games} games each, ok)", plies,
+        elapsed[Board], elapsed[BitBoard])
+
+
+# # #
+# Legal action tracking
+#
+
+def _scan_legal(game):
+    """
+    Cells where a PLACE action is legal, found by scanning the board.
+    """
+    n = game.board.n
+    legal = set()
+    for r in range(n):
+        for q in range(n):
+            if game.board.is_occupied((r, q)):
+                continue
+            if game.nturns == 0 and n % 2 == 1 and r == q == n // 2:
+                continue
+            legal.add((r, q))
+    return legal
+
+
+def bench_legal(sizes=(3, 4, 5, 7), games=20, seed=0):
+    """
+    Play random games, deep-copying each game at a random ply and playing
+    the copy on independently (with a STEAL on the second turn half of the
+    time), checking both games' legal_actions against a scan of the board
+    at every ply, and time both ways of finding legal cells.
+    """
+    rng = random.Random(seed)
+    calls = 0
+    elapsed = {"scan": 0.0, "mask": 0.0}
+    for n in sizes:
+        for number in range(games):
+            copy_at = rng.randrange(1, n * n // 2)
+            active = [Game(n)]
+            ply = 0
+            while active:
+                ply += 1
+                if ply == copy_at:
+                    active.append(copy.deepcopy(active[0]))
+                for i, game in enumerate(active):
+                    start = time.perf_counter()
+                    expected = _scan_legal(game)
+                    elapsed["scan"] += time.perf_counter() - start
+                    start = time.perf_counter()
+                    mask = game.legal_actions()
+                    actual = set(zip(*map(list, mask.nonzero())))
+                    elapsed["mask"] += time.perf_counter() - start
+                    calls += 1
+                    if expected != actual:
+                        raise AssertionError(
+                            f"n={n}, game {number}, ply {ply}"
+                            f"{' (copy)' if i else ''}: legal cells differ: "
+                            f"{sorted(expected)} != {sorted(actual)}"
+                        )
+                    player = game._turn_player()
+                    if game.nturns == 1 and rng.random() < 0.5:
+                        game.update(player, ("STEAL",))
+                    else:
+                        game.update(player, ("PLACE", *rng.choice(
+                            sorted(expected))))
+                active = [game for game in active if not game.over()]
+
+    _report(f"legal (n in {list(sizes)}, {games} games each, ok)", calls,
+        elapsed["scan"], elapsed["mask"])
+
+
+# # #
+# Wall-clock limits
+#
+
+class _Player:
+    """
+    Player placing tokens in the first free cell (in row-major order).
+    """
+
+    def __init__(self, player, n):
+        self.n = n
+        self.taken = set()
+        self.actions = 0
+
+    def action(self):
+        self.actions += 1
+        for r in range(self.n):
+            for q in range(self.n):
+                if (r, q) not in self.taken:
+                    return ("PLACE", r, q)
+
+    def turn(self, player, action):
+        self.taken.add(tuple(action[1:]))
+
+
+class _Staller(_Player):
+    """
+    _Player that stalls (blocking) on its second action.
+    """
+
+    def action(self):
+        action = super().action()
+        if self.actions == 2:
+            time.sleep(10)
+        return action
+
+
+class _AsyncPlayer(_Player):
+    """
+    _Player whose action method is a coroutine function.
+    """
+
+    async def action(self):
+        await asyncio.sleep(0)
+        return _Player.action(self)
+
+
+class _AsyncStaller(_Player):
+    """
+    _AsyncPlayer that stalls (without blocking) on its second action.
+    """
+
+    async def action(self):
+        action = _Player.action(self)
+        if self.actions == 2:
+            await asyncio.sleep(10)
+        return action
+
+
+def _wait_for_server(address, timeout=5):
+    """
+    Wait until a player server is accepting connections at address.
+    """
+    family, sockaddr = parse_address(address)
+    deadline = time.perf_counter() + timeout
+    while True:
+        with socket.socket(family, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(sockaddr)
+                return
+            except OSError:
+                if time.perf_counter() > deadline:
+                    raise
+        time.sleep(0.01)
+
+
+def bench_limits(move_time=0.2, wall_time=0.5):
+    """
+    Play games in which red stalls on its second action, synchronously and
+    asynchronously (in process, and over a socket), under per-move and
+    per-game wall-clock limits. Check that each game is forfeit by red,
+    and report how long red's stalled call took before it was stopped.
+    """
+    config(level=-1)
+    here = "referee.benchmark"
+    with tempfile.TemporaryDirectory() as directory:
+        # serve a staller (over a Unix domain socket, if available)
+        address = f"unix://{os.path.join(directory, 'staller')}"
+        if not hasattr(asyncio, "open_unix_connection"):
+            address = "tcp://localhost:47823"
+        server = threading.Thread(target=serve,
+            args=((here, "_Staller"), address), daemon=True)
+        server.start()
+        _wait_for_server(address)
+
+        cases = [
+            ("sync", play, PlayerWrapper, "_Staller", "_Player"),
+            ("async", play_async, PlayerWrapper, "_AsyncStaller",
+                "_AsyncPlayer"),
+            ("async socket", play_async, AsyncSocketPlayerWrapper, address,
+                "_AsyncPlayer"),
+        ]
+        for name, play_game, Wrapper, red, blue in cases:
+            for limit, limits in (("move", {"move_time": move_time}),
+                    ("game", {"wall_time": wall_time})):
+                players = [
+                    Wrapper("red", (red, None) if Wrapper
+                        is AsyncSocketPlayerWrapper else (here, red),
+                        **limits),
+                    PlayerWrapper("blue", (here, blue), **limits),
+                ]
+                start = time.perf_counter()
+                try:
+                    result = play_game(players, n=5, print_state=False)
+                    if play_game is play_async:
+                        result = asyncio.run(result)
+                except ResourceLimitException as e:
+                    if e.player != "red":
+                        raise AssertionError(
+                            f"{name} ({limit} limit): forfeit by {e.player}")
+                else:
+                    raise AssertionError(
+                        f"{name} ({limit} limit): not forfeit ({result})")
+                finally:
+                    for player in players:
+                        player.close()
+                print(
+                    f"limits ({name}, per-{limit} limit "
+                    f"{limits.get('move_time') or limits.get('wall_time')}s): "
+                    f"red forfeit, stalled call stopped after "
+                    f"{players[0].wall.last:.3f}s "
+                    f"(game took {time.perf_counter() - start:.3f}s)"
+                )
+
+
+BENCHMARKS = {
+    "captures": bench_captures,
+    "render": bench_render,
+    "parity": bench_parity,
+    "limits": bench_limits,
+    "legal": bench_legal,
+}
+
+
+def main(names):
+    for name in names or BENCHMARKS:
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
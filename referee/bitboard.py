@@ -0,0 +1,282 @@
+"""
+Provide an alternative Cachex board representation backed by two packed
+integer bitboards (one per player colour).
+
+This class is a drop-in replacement for `referee.board.Board` (it exposes
+the same `place`/`swap`/`connected_coords`/`digest` API), but avoids NumPy
+and per-cell token mapping entirely. Cell (r, q) is stored at bit r * n + q
+of the bitboard for the token occupying it. Neighbour and capture masks are
+pre-computed once per board size, so placing a token and applying captures
+only involves a handful of integer bitwise operations.
+"""
+
+from functools import lru_cache
+
+from referee.board import _HEX_STEPS, _CAPTURE_PATTERNS, _ADD
+from referee.board import _TOKEN_AXIS, _DisjointSets, _zobrist_table
+from referee.board import Undo, _rollback
+
+# Bitboard index for each player token type
+_TOKEN_INDEX = { "red": 0, "blue": 1 }
+
+
+@lru_cache(maxsize=None)
+def _tables(n):
+    """
+    Pre-compute (and cache per board size) the neighbour masks, capture
+    masks and transpose permutation for a board of size n.
+
+    * neighbours[i] is a bitmask of the within-bounds neighbours of cell i.
+    * captures[i] is a list of (opposite bit, mid cells mask) pairs, one per
+      within-bounds diamond capture pattern intersecting cell i.
+    * transpose[i] is the index of cell i after mirroring along the major
+      board axis.
+    """
+    inside = lambda c: 0 <= c[0] < n and 0 <= c[1] < n
+    bit = lambda c: 1 << int(c[0] * n + c[1])
+
+    neighbours, captures, transpose = [], [], []
+    for r in range(n):
+        for q in range(n):
+            coord = (r, q)
+            mask = 0
+            for step in _HEX_STEPS:
+                adj = _ADD(coord, step)
+                if inside(adj):
+                    mask |= bit(adj)
+            neighbours.append(mask)
+
+            patterns = []
+            for pattern in _CAPTURE_PATTERNS:
+                coords = [_ADD(coord, s) for s in pattern]
+                if all(map(inside, coords)):
+                    patterns.append((bit(coords[0]),
+                        bit(coords[1]) | bit(coords[2])))
+            captures.append(patterns)
+
+            transpose.append(q * n + r)
+
+    return neighbours, captures, transpose
+
+
+class BitBoard:
+    def __init__(self, n):
+        """
+        Initialise board of given size n.
+        """
+        self.n = n
+        self._bits = [0, 0]
+        self._neighbours, self._captures, self._transpose = _tables(n)
+        self._trail = []
+        self._groups = [_DisjointSets(n, _TOKEN_AXIS[token], self._trail) 
+            for token in _TOKEN_INDEX]
+        self._zobrist = _zobrist_table(n)
+        self.zobrist = 0
+
+    def __getitem__(self, coord):
+        """
+        Get the token at given board coord (r, q).
+        """
+        bit = 1 << (coord[0] * self.n + coord[1])
+        if self._bits[0] & bit:
+            return "red"
+        if self._bits[1] & bit:
+            return "blue"
+        return None
+
+    def __setitem__(self, coord, token):
+        """
+        Set the token at given board coord (r, q).
+        """
+        index = coord[0] * self.n + coord[1]
+        bit = 1 << index
+        # Zobrist keys are indexed by token type (0 empty, 1 red, 2 blue)
+        keys = self._zobrist[index]
+        for i in (0, 1):
+            if self._bits[i] & bit:
+                self.zobrist ^= keys[i + 1]
+        self._bits[0] &= ~bit
+        self._bits[1] &= ~bit
+        if token is not None:
+            self._bits[_TOKEN_INDEX[token]] |= bit
+            self.zobrist ^= keys[_TOKEN_INDEX[token] + 1]
+
+    def token_types(self):
+        """
+        Internal token types (0: empty, 1: red, 2: blue) of every cell as a
+        flat list, in row-major order (cell (r, q) is at index r * n + q).
+        """
+        red, blue = self._bits
+        return [(red >> i & 1) | (blue >> i & 1) << 1 
+            for i in range(self.n * self.n)]
+
+    def digest(self):
+        """
+        Digest of the board state (to help with counting repeated states).
+        `zobrist` is a 64-bit hash of the same state, kept up to date as the
+        board changes (and equal to Board's hash for equal states).
+        """
+        return (self._bits[0], self._bits[1])
+
+    def zobrist_full(self):
+        """
+        Recompute the Zobrist hash of the board state from scratch.
+        """
+        key = 0
+        for i in (0, 1):
+            bits = self._bits[i]
+            while bits:
+                low = bits & -bits
+                key ^= self._zobrist[low.bit_length() - 1][i + 1]
+                bits ^= low
+        return key
+
+    def swap(self):
+        """
+        Swap player positions by mirroring the state along the major
+        board axis. This is really just a "matrix transpose" op combined
+        with a swap between player token types. Swapping is its own
+        inverse, so a STEAL is undone by swapping again.
+        """
+        swapped = [0, 0]
+        for src, dst in ((0, 1), (1, 0)):
+            bits = self._bits[src]
+            while bits:
+                low = bits & -bits
+                swapped[dst] |= 1 << self._transpose[low.bit_length() - 1]
+                bits ^= low
+        self._bits = swapped
+        self.zobrist = self.zobrist_full()
+        self._groups = [self._groups[1].transpose(), 
+            self._groups[0].transpose()]
+
+    def place(self, token, coord):
+        """
+        Place a token on the board and apply captures if they exist.
+        Return an Undo record, including coordinates of captured tokens
+        (see `unplace`).
+        """
+        zobrist, mark = self.zobrist, len(self._trail)
+        self[coord] = token
+        self._groups[_TOKEN_INDEX[token]].add(coord[0] * self.n + coord[1])
+        return Undo(coord, self._apply_captures(coord), zobrist, mark)
+
+    def unplace(self, undo):
+        """
+        Take back a placement, given the Undo record returned by `place`.
+        Placements (and swaps) must be taken back in reverse order.
+        """
+        n = self.n
+        bit = 1 << (undo.coord[0] * n + undo.coord[1])
+        placed = 0 if self._bits[0] & bit else 1
+        for r, q in undo.captured:
+            self._bits[1 - placed] |= 1 << (r * n + q)
+        self._bits[placed] &= ~bit
+        self.zobrist = undo.zobrist
+        _rollback(self._trail, undo.mark)
+
+    def forget_undo(self):
+        """
+        Forget how to take back the placements made so far, discarding the
+        undo trail (so it does not keep growing, and swaps stay cheap, when
+        nothing will be taken back). Undo records returned by earlier calls
+        to `place` can no longer be used.
+        """
+        del self._trail[:]
+
+    def connects_edges(self, token):
+        """
+        True iff tokens of the given player form a continuous path between
+        the two board edges that player is trying to connect. Only tracks
+        tokens added through `place`.
+        """
+        return self._groups[_TOKEN_INDEX[token]].connected()
+
+    def connected_coords(self, start_coord):
+        """
+        Find connected coordinates from start_coord. This uses the token
+        value of the start_coord cell to determine which other cells are
+        connected (e.g., all will be the same value).
+        """
+        n = self.n
+        start = start_coord[0] * n + start_coord[1]
+        start_bit = 1 << start
+        if self._bits[0] & start_bit:
+            same = self._bits[0]
+        elif self._bits[1] & start_bit:
+            same = self._bits[1]
+        else:
+            same = ~(self._bits[0] | self._bits[1]) & ((1 << (n * n)) - 1)
+
+        # Flood fill from the start cell over cells of the same token type
+        reachable = frontier = start_bit
+        while frontier:
+            grown = 0
+            while frontier:
+                low = frontier & -frontier
+                grown |= self._neighbours[low.bit_length() - 1]
+                frontier ^= low
+            frontier = grown & same & ~reachable
+            reachable |= frontier
+
+        return self._coords(reachable)
+
+    def inside_bounds(self, coord):
+        """
+        True iff coord inside board bounds.
+        """
+        r, q = coord
+        return r >= 0 and r < self.n and q >= 0 and q < self.n
+
+    def is_occupied(self, coord):
+        """
+        True iff coord is occupied by a token (e.g., not None).
+        """
+        bit = 1 << (coord[0] * self.n + coord[1])
+        return bool((self._bits[0] | self._bits[1]) & bit)
+
+    def _apply_captures(self, coord):
+        """
+        Check coord for diamond captures, and apply these to the board
+        if they exist. Returns a list of captured token coordinates.
+        """
+        index = coord[0] * self.n + coord[1]
+        if self._bits[0] & (1 << index):
+            opp, mid = 0, 1
+        elif self._bits[1] & (1 << index):
+            opp, mid = 1, 0
+        else:
+            return []
+        opp_bits, mid_bits = self._bits[opp], self._bits[mid]
+
+        # Capturing is deferred in case of overlaps (same as Board)
+        captured = 0
+        for opp_bit, mid_mask in self._captures[index]:
+            if opp_bits & opp_bit and mid_bits & mid_mask == mid_mask:
+                captured |= mid_mask
+
+        # Remove any captured tokens
+        self._bits[mid] &= ~captured
+        bits = captured
+        while bits:
+            low = bits & -bits
+            self.zobrist ^= self._zobrist[low.bit_length() - 1][mid + 1]
+            bits ^= low
+
+        # Captured tokens break up paths, so rebuild the affected sets
+        captured = self._coords(captured)
+        if captured:
+            self._groups[mid].remove([r * self.n + q for r, q in captured])
+
+        return captured
+
+    def _coords(self, bits):
+        """
+        Convert a bitmask of cells into a list of (r, q) coordinates.
+        """
+        coords = []
+        while bits:
+            low = bits & -bits
+            coords.append(divmod(low.bit_length() - 1, self.n))
+            bits ^= low
+        return coords
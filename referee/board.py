@@ -13,7 +13,11 @@ representing the state of a game, with respect to your chosen strategy.
 """
 
 from queue import Queue
-from numpy import zeros, array, roll, vectorize
+from collections import namedtuple
+from random import Random
+from functools import lru_cache
+from numpy import zeros, array, roll, unique, take, swapaxes
+from numpy import may_share_memory
 
 # Utility function to add two coord tuples
 _ADD = lambda a, b: (a[0] + b[0], a[1] + b[1])
@@ -44,6 +48,200 @@ _TOKEN_MAP_IN = {v: k for k, v in _TOKEN_MAP_OUT.items()}
 
 # Map between player token types
 _SWAP_PLAYER = { 0: 0, 1: 2, 2: 1 }
+_SWAP_TABLE = array([_SWAP_PLAYER[t] for t in range(3)])
+
+# Board axis each player aims to connect (red: r axis, blue: q axis)
+_TOKEN_AXIS = { "red": 0, "blue": 1 }
+
+# Undo record returned by Board.place: the placed coord, the coords of any
+# captured tokens, the Zobrist hash before placing, and a trail mark (the
+# length of the board's undo trail before placing)
+Undo = namedtuple("Undo", "coord captured zobrist mark")
+
+
+def swap_many(boards, out=None):
+    """
+    Apply the STEAL swap (see Board.swap) to a batch of board states, given
+    as an array of internal token types with shape (..., n, n). Results are
+    written to out if given (which may be boards itself, to swap in place),
+    otherwise to a new array. Returns the swapped array.
+    """
+    table = _SWAP_TABLE.astype(boards.dtype, copy=False)
+    # Unbuffered lookups are only safe if out and boards don't overlap
+    buffered = out is not None and may_share_memory(boards, out)
+    return take(table, swapaxes(boards, -1, -2), out=out, 
+        mode="raise" if buffered else "clip")
+
+
+@lru_cache(maxsize=None)
+def _neighbour_table(n):
+    """
+    Pre-compute (and cache per board size) the flat indices of the
+    within-bounds neighbours of each flat cell index r * n + q.
+    """
+    table = []
+    for r in range(n):
+        for q in range(n):
+            table.append([int(r + dr) * n + int(q + dq) 
+                for dr, dq in _HEX_STEPS 
+                if 0 <= r + dr < n and 0 <= q + dq < n])
+    return table
+
+
+@lru_cache(maxsize=None)
+def _zobrist_table(n):
+    """
+    Pre-compute (and cache per board size) random 64-bit Zobrist keys for
+    each flat cell index, indexed by internal token type. Empty cells have
+    key 0. Keys are seeded by n, so equal states always hash equally.
+    """
+    rng = Random(n)
+    return [(0, rng.getrandbits(64), rng.getrandbits(64)) 
+        for _ in range(n * n)]
+
+
+@lru_cache(maxsize=None)
+def _capture_table(n):
+    """
+    Pre-compute (and cache per board size) the within-bounds capture 
+    patterns intersecting each flat cell index r * n + q. Each entry is an
+    integer array with one row of flat indices per pattern:
+    [opposite cell, neighbour 1 cell, neighbour 2 cell].
+    """
+    table = []
+    for r in range(n):
+        for q in range(n):
+            rows = []
+            for pattern in _CAPTURE_PATTERNS:
+                coords = [_ADD((r, q), s) for s in pattern]
+                # No point checking if any coord is outside the board!
+                if all(0 <= cr < n and 0 <= cq < n for cr, cq in coords):
+                    rows.append([cr * n + cq for cr, cq in coords])
+            table.append(array(rows, dtype=int).reshape(-1, 3))
+    return table
+
+
+def _rollback(trail, mark):
+    """
+    Undo logged union-find writes (see _DisjointSets) until the trail is
+    back to length mark.
+    """
+    while len(trail) > mark:
+        values, i, old = trail.pop()
+        values[i] = old
+
+
+class _DisjointSets:
+    """
+    Union-find over the tokens of a single player, used to detect winning
+    paths incrementally. Cells are identified by flat index r * n + q, and
+    two extra "virtual" nodes stand for the two board edges the player is
+    trying to connect (n * n for the low edge, n * n + 1 for the high edge).
+    The player has a winning path iff both virtual nodes share a root.
+
+    Every write is logged to `trail` (as a (list, index, old value) triple)
+    so it can be rolled back with _rollback. Paths are not compressed, to
+    keep the log short (union by size keeps trees shallow anyway).
+    """
+
+    def __init__(self, n, axis, trail=None):
+        self.n = n
+        self.axis = axis
+        self.lo, self.hi = n * n, n * n + 1
+        self.parent = list(range(n * n + 2))
+        self.size = [1] * (n * n + 2)
+        self.present = bytearray(n * n)
+        self.trail = [] if trail is None else trail
+        self._neighbours = _neighbour_table(n)
+
+    def _set(self, values, i, value):
+        """
+        Set values[i] (one of parent, size or present), logging the write.
+        """
+        self.trail.append((values, i, values[i]))
+        values[i] = value
+
+    def find(self, i):
+        """
+        Root of node i.
+        """
+        parent = self.parent
+        while parent[i] != i:
+            i = parent[i]
+        return i
+
+    def union(self, i, j):
+        """
+        Merge the sets containing nodes i and j (union by size).
+        """
+        i, j = self.find(i), self.find(j)
+        if i == j:
+            return
+        if self.size[i] < self.size[j]:
+            i, j = j, i
+        self._set(self.parent, j, i)
+        self._set(self.size, i, self.size[i] + self.size[j])
+
+    def add(self, i):
+        """
+        Add a token at flat index i, joining it to adjacent tokens of the
+        same player and to any board edge it lies on.
+        """
+        self._set(self.present, i, 1)
+        for j in self._neighbours[i]:
+            if self.present[j]:
+                self.union(i, j)
+        pos = divmod(i, self.n)[self.axis]
+        if pos == 0:
+            self.union(i, self.lo)
+        if pos == self.n - 1:
+            self.union(i, self.hi)
+
+    def remove(self, indices):
+        """
+        Remove tokens at the given flat indices. Union-find cannot split
+        sets, so the sets that contained removed tokens are rebuilt from
+        their surviving members (other sets are untouched).
+        """
+        roots = set(self.find(i) for i in indices)
+        members = [i for i in range(self.n * self.n + 2) 
+            if (i >= self.lo or self.present[i]) and self.find(i) in roots]
+        for i in members:
+            self._set(self.parent, i, i)
+            self._set(self.size, i, 1)
+        for i in indices:
+            self._set(self.present, i, 0)
+        for i in members:
+            if i < self.lo and self.present[i]:
+                self.add(i)
+
+    def connected(self):
+        """
+        True iff the player's tokens connect both of its board edges.
+        """
+        return self.find(self.lo) == self.find(self.hi)
+
+    def transpose(self):
+        """
+        Mirror these sets (in place) along the major board axis, for the
+        other player (edge nodes map onto the other player's edges). Logged
+        writes are mirrored too, so they can still be rolled back. Returns
+        self.
+        """
+        n, lo = self.n, self.lo
+        mirror = lambda i: i if i >= lo else (i % n) * n + i // n
+        order = [mirror(i) for i in range(n * n + 2)]
+        self.parent[:] = [mirror(self.parent[i]) for i in order]
+        self.size[:] = [self.size[i] for i in order]
+        self.present[:] = bytes(self.present[i] for i in order[:lo])
+        for k, (values, i, old) in enumerate(self.trail):
+            if values is self.parent:
+                self.trail[k] = (values, mirror(i), mirror(old))
+            elif values is self.size or values is self.present:
+                self.trail[k] = (values, mirror(i), old)
+        self.axis = 1 - self.axis
+        return self
+
 
 class Board:
     def __init__(self, n):
@@ -52,6 +250,13 @@ class Board:
         """
         self.n = n
         self._data = zeros((n, n), dtype=int)
+        self._spare = zeros((n, n), dtype=int)
+        self._trail = []
+        self._groups = {token: _DisjointSets(n, axis, self._trail) 
+            for token, axis in _TOKEN_AXIS.items()}
+        self._captures = _capture_table(n)
+        self._zobrist = _zobrist_table(n)
+        self.zobrist = 0
 
     def __getitem__(self, coord):
         """
@@ -63,31 +268,95 @@ class Board:
         """
         Set the token at given board coord (r, q).
         """
-        self._data[coord] = _TOKEN_MAP_IN[token]
+        keys = self._zobrist[coord[0] * self.n + coord[1]]
+        token_type = _TOKEN_MAP_IN[token]
+        self.zobrist ^= keys[self._data[coord]] ^ keys[token_type]
+        self._data[coord] = token_type
+
+    def token_types(self):
+        """
+        Internal token types (0: empty, 1: red, 2: blue) of every cell as a
+        flat list, in row-major order (cell (r, q) is at index r * n + q).
+        """
+        return self._data.ravel().tolist()
 
     def digest(self):
         """
         Digest of the board state (to help with counting repeated states).
-        Could use a hash function, but not really necessary for our purposes.
+        This is exact but allocates; `zobrist` is a cheaper 64-bit hash of
+        the same state, kept up to date as the board changes.
         """
         return self._data.tobytes()
 
+    def zobrist_full(self):
+        """
+        Recompute the Zobrist hash of the board state from scratch.
+        """
+        key = 0
+        for keys, token_type in zip(self._zobrist, self._data.flat):
+            key ^= keys[token_type]
+        return key
+
     def swap(self):
         """
         Swap player positions by mirroring the state along the major 
         board axis. This is really just a "matrix transpose" op combined
-        with a swap between player token types.
+        with a swap between player token types. Swapping is its own
+        inverse, so a STEAL is undone by swapping again.
         """
-        swap_player_tokens = vectorize(lambda t: _SWAP_PLAYER[t])
-        self._data = swap_player_tokens(self._data.transpose())
+        # Look up swapped tokens of the transposed state into a spare 
+        # buffer, then flip buffers (no allocation per call)
+        take(_SWAP_TABLE, self._data.transpose(), out=self._spare, 
+            mode="clip")
+        self._data, self._spare = self._spare, self._data
+        self.zobrist = self.zobrist_full()
+        self._groups = {
+            "red": self._groups["blue"].transpose(),
+            "blue": self._groups["red"].transpose(),
+        }
 
     def place(self, token, coord):
         """
         Place a token on the board and apply captures if they exist.
-        Return coordinates of captured tokens.
+        Return an Undo record, including coordinates of captured tokens
+        (see `unplace`).
         """
+        zobrist, mark = self.zobrist, len(self._trail)
         self[coord] = token
-        return self._apply_captures(coord)
+        self._groups[token].add(coord[0] * self.n + coord[1])
+        return Undo(coord, self._apply_captures(coord), zobrist, mark)
+
+    def unplace(self, undo):
+        """
+        Take back a placement, given the Undo record returned by `place`.
+        Placements (and swaps) must be taken back in reverse order.
+        """
+        n = self.n
+        cells = self._data.flat
+        index = undo.coord[0] * n + undo.coord[1]
+        mid_type = _SWAP_PLAYER[cells[index]]
+        for r, q in undo.captured:
+            cells[r * n + q] = mid_type
+        cells[index] = 0
+        self.zobrist = undo.zobrist
+        _rollback(self._trail, undo.mark)
+
+    def forget_undo(self):
+        """
+        Forget how to take back the placements made so far, discarding the
+        undo trail (so it does not keep growing, and swaps stay cheap, when
+        nothing will be taken back). Undo records returned by earlier calls
+        to `place` can no longer be used.
+        """
+        del self._trail[:]
+
+    def connects_edges(self, token):
+        """
+        True iff tokens of the given player form a continuous path between
+        the two board edges that player is trying to connect. Only tracks
+        tokens added through `place`.
+        """
+        return self._groups[token].connected()
 
     def connected_coords(self, start_coord):
         """
@@ -130,26 +399,33 @@ class Board:
         Check coord for diamond captures, and apply these to the board
         if they exist. Returns a list of captured token coordinates.
         """
-        opp_type = self._data[coord]
+        n = self.n
+        cells = self._data.flat
+        opp_type = cells[coord[0] * n + coord[1]]
         mid_type = _SWAP_PLAYER[opp_type]
-        captured = set()
-
-        # Check each capture pattern intersecting with coord
-        for pattern in _CAPTURE_PATTERNS:
-            coords = [_ADD(coord, s) for s in pattern]
-            # No point checking if any coord is outside the board!
-            if all(map(self.inside_bounds, coords)):
-                tokens = [self._data[coord] for coord in coords]
-                if tokens == [opp_type, mid_type, mid_type]:
-                    # Capturing has to be deferred in case of overlaps
-                    # Both mid cell tokens should be captured
-                    captured.update(coords[1:])
+
+        # Check every (within-bounds) capture pattern intersecting with coord
+        # at once: each row of the table is [opposite, mid 1, mid 2] indices
+        patterns = self._captures[coord[0] * n + coord[1]]
+        tokens = cells[patterns]
+        formed = (tokens[:, 0] == opp_type) & (tokens[:, 1] == mid_type) \
+            & (tokens[:, 2] == mid_type)
+        if not formed.any():
+            return []
+
+        # Capturing has to be deferred in case of overlaps
+        # Both mid cell tokens should be captured
+        captured = unique(patterns[formed, 1:]).tolist()
 
         # Remove any captured tokens
-        for coord in captured:
-            self[coord] = None
+        cells[captured] = 0
+        for i in captured:
+            self.zobrist ^= self._zobrist[i][mid_type]
+
+        # Captured tokens break up paths, so rebuild the affected sets
+        self._groups[_TOKEN_MAP_OUT[mid_type]].remove(captured)
 
-        return list(captured)
+        return [divmod(i, n) for i in captured]
 
     def _coord_neighbours(self, coord):
         """
@@ -6,13 +6,21 @@ a game log.
 
 import sys
 import time
+import asyncio
+import inspect
 import logging
 import collections
 
-from itertools import islice
+from array import array
+from functools import lru_cache
+
+from numpy import ones
 
 from referee.board import Board
-from referee.log import comment
+from referee.bitboard import BitBoard
+from referee.log import comment, flush
+from referee.record import write_record, encode_action, result_code
+from referee.record import RESULT_CODES
 
 # Game-specific constants for use in other modules:
 
@@ -20,6 +28,12 @@ GAME_NAME = "Cachex"
 COLOURS = "red", "blue"
 NUM_PLAYERS = 2
 
+# Available board representations (selectable by name)
+BOARD_TYPES = {
+    "numpy": Board,
+    "bitboard": BitBoard,
+}
+
 # # #
 # Generic play function:
 #
@@ -36,6 +50,9 @@ def play(
     log_filename=None,
     log_file=None,
     out_function=comment,
+    board_cls=Board,
+    verify_hash=False,
+    record_filename=None,
 ):
     """
     Coordinate a game, return a string describing the result.
@@ -55,6 +72,12 @@ def play(
     * log_filename   -- If not None, log all game actions to this path.
     * out_function   -- Use this function (instead of default 'comment')
                         for all output messages.
+    * board_cls      -- Board representation class to use (see
+                        BOARD_TYPES).
+    * verify_hash    -- If True, check the incremental state hashes used
+                        for draw detection against full board digests.
+    * record_filename -- If not None, write a binary record of the game to
+                        this path (see referee.record).
     """
     # Configure behaviour of this function depending on parameters:
     if delay > 0:
@@ -66,6 +89,7 @@ def play(
 
         def wait():
             comment("(press enter to continue)", end="")
+            flush()
             input()
 
     else:
@@ -73,34 +97,142 @@ def play(
         def wait():
             pass
 
-    if print_state:
+    # Set up a new game, then run the game loop, making each player call
+    # it asks for (see _play_turns)
+    game = Game(
+        n,
+        log_filename=log_filename,
+        log_file=log_file,
+        board_cls=board_cls,
+        verify_hash=verify_hash,
+        record_filename=record_filename,
+        player_names=[getattr(p, "location", p.name) for p in players],
+    )
+    display_state = _display_function(
+        print_state, use_debugboard, use_colour, use_unicode
+    )
+    turns = _play_turns(game, players, display_state)
+    try:
+        result = None
+        while True:
+            call = turns.send(result)
+            if call is _WAIT:
+                result = wait()
+            else:
+                player, method, args = call
+                result = getattr(player, method)(*args)
+    except StopIteration as stop:
+        return stop.value
+    except BaseException:
+        # Game aborted (e.g. illegal action or resource limit); make sure
+        # the log and record are closed
+        game.close()
+        raise
+
+
+async def play_async(
+    players,
+    n=5,
+    delay=0,
+    print_state=True,
+    use_debugboard=False,
+    use_colour=False,
+    use_unicode=False,
+    log_filename=None,
+    log_file=None,
+    out_function=comment,
+    board_cls=Board,
+    verify_hash=False,
+    record_filename=None,
+):
+    """
+    Coordinate a game as a coroutine, return a string describing the
+    result. Arguments are as for `play`, except that the player wrappers'
+    coroutine variants of their methods (`init_async`, `action_async` and
+    `turn_async`; see referee.player.PlayerWrapper) are used where they
+    exist, and otherwise their methods may return awaitables, which are
+    awaited. Waiting between turns does not block the event loop, so one
+    loop can drive many concurrent games.
+
+    The rules, and any resource limits enforced by the player wrappers,
+    apply exactly as for `play` (the wrappers enforce them while awaiting
+    the real players' coroutines, too).
+    """
+    loop = asyncio.get_running_loop()
+    if delay > 0:
 
-        def display_state(game):
-            comment("displaying game info:")
-            comment(
-                _RENDER(
-                    game,
-                    use_debugboard=use_debugboard,
-                    use_colour=use_colour,
-                    use_unicode=use_unicode,
-                ),
-                depth=1,
-            )
+        async def wait():
+            await asyncio.sleep(delay)
+
+    elif delay < 0:
+
+        async def wait():
+            comment("(press enter to continue)", end="")
+            flush()
+            await loop.run_in_executor(None, input)
 
     else:
 
-        def display_state(game):
+        async def wait():
             pass
 
-    # Set up a new game and initialise the players (constructing the
-    # Player classes including running their .__init__() methods).
-    game = Game(n, log_filename=log_filename, log_file=log_file)
+    game = Game(
+        n,
+        log_filename=log_filename,
+        log_file=log_file,
+        board_cls=board_cls,
+        verify_hash=verify_hash,
+        record_filename=record_filename,
+        player_names=[getattr(p, "location", p.name) for p in players],
+    )
+    display_state = _display_function(
+        print_state, use_debugboard, use_colour, use_unicode
+    )
+    turns = _play_turns(game, players, display_state)
+    try:
+        result = None
+        while True:
+            call = turns.send(result)
+            if call is _WAIT:
+                result = await wait()
+            else:
+                player, method, args = call
+                coroutine = getattr(player, f"{method}_async", None)
+                if coroutine is not None:
+                    result = await coroutine(*args)
+                else:
+                    result = getattr(player, method)(*args)
+                    if inspect.isawaitable(result):
+                        result = await result
+    except StopIteration as stop:
+        return stop.value
+    except BaseException:
+        # Game aborted (e.g. illegal action, resource limit or cancelled
+        # task); make sure the log and record are closed
+        game.close()
+        raise
+
+
+# Yielded by _play_turns to ask for the pause between turns
+_WAIT = object()
+
+
+def _play_turns(game, players, display_state):
+    """
+    The game loop shared by `play` and `play_async`, as a generator. Each
+    player call is yielded as a (player wrapper, method name, args) triple,
+    for the caller to make (and await, if need be) and send back the
+    result; _WAIT is yielded
+    between turns. Returns the result of the game.
+    """
+    # Initialise the players (constructing the Player classes including
+    # running their .__init__() methods).
     comment("initialising players", depth=-1)
     for player, colour in zip(players, COLOURS):
         # NOTE: `player` here is actually a player wrapper. Your program
         # should still implement a method called `__init__()`, not one
         # called `init()`:
-        player.init(colour, n)
+        yield player, "init", (colour, game.board.n)
 
     # Display the initial state of the game.
     comment("game start!", depth=-1)
@@ -109,11 +241,11 @@ def play(
     # Repeat the following until the game ends
     turn = 1
     while not game.over():
-        comment(f"Turn {turn}", depth=-1)
+        comment("Turn %d", turn, depth=-1)
         curr_player = players[(turn - 1) % 2]
 
         # Ask current player for their next action (calling .action() method)
-        action = curr_player.action()
+        action = yield curr_player, "action", ()
 
         # Validate player's action and apply it to the game if is allowed.
         sanitised_action = game.update(curr_player.colour, action)
@@ -123,17 +255,45 @@ def play(
 
         # Notify both players of the action (via .turn() methods)
         for player in players:
-            player.turn(curr_player.colour, sanitised_action)
+            yield player, "turn", (curr_player.colour, sanitised_action)
 
-        # Next turn!
+        # Next turn! (writing out this turn's output, if it was buffered)
         turn += 1
-        wait()
+        flush()
+        yield _WAIT
 
     # After that loop, the game has ended (one way or another!)
     result = game.end()
+    flush()
     return result
 
 
+def _display_function(print_state, use_debugboard, use_colour, use_unicode):
+    """
+    Function to display the game state after each update (or not).
+    """
+    if print_state:
+
+        def display_state(game):
+            comment("displaying game info:")
+            comment(
+                lambda: _RENDER(
+                    game,
+                    use_debugboard=use_debugboard,
+                    use_colour=use_colour,
+                    use_unicode=use_unicode,
+                ),
+                depth=1,
+            )
+
+    else:
+
+        def display_state(game):
+            pass
+
+    return display_state
+
+
 # # #
 # Game rules implementation
 #
@@ -163,26 +323,58 @@ _MAX_TURNS = 343
 class IllegalActionException(Exception):
     """If this action is illegal based on the current board state."""
 
+    def __init__(self, message, player=None):
+        super().__init__(message)
+        self.player = player  # colour of the offending player (if known)
+
 
 class Game:
     """
     Represent the evolving state of a game. Main useful methods
-    are __init__, update, over, end, and __str__.
+    are __init__, update, legal_actions, over, end, and __str__.
     """
 
-    def __init__(self, n, log_filename=None, log_file=None):
-        # Initialise game board
-        self.board = Board(n)
+    def __init__(
+        self,
+        n,
+        log_filename=None,
+        log_file=None,
+        board_cls=Board,
+        verify_hash=False,
+        record_filename=None,
+        player_names=("red", "blue"),
+    ):
+        # Initialise game board (any class with the Board API will do)
+        self.board = board_cls(n)
+
+        # Keep all (encoded) moves, to write a binary record of the game
+        self.moves = array("h")
+        self.record_filename = record_filename
+        self.player_names = player_names
 
         # Also keep track of some other state variables for win/draw
-        # detection (number of turns, state history)
+        # detection (number of turns, state history). States are counted by
+        # their incremental (Zobrist) hash rather than their full digest
         self.nturns = 0
         self.last_captures = []
         self.last_coord = (-1, -1)
-        self.history = collections.Counter({self.board.digest(): 1})
+        self.history = collections.Counter({self.board.zobrist: 1})
         self.result = None
         self.result_cluster = set()
 
+        # Keep a mask of the cells where a PLACE action is currently legal
+        # (updated incrementally, so validation and move listing need not
+        # scan the board). The centre cell is not legal on the first move
+        self._legal = ones((n, n), dtype=bool)
+        if n % 2 == 1:
+            self._legal[n // 2, n // 2] = False
+
+        # In verification mode, also count states by their full digest, so
+        # that hash mismatches or collisions can be detected
+        self.digest_history = None
+        if verify_hash:
+            self.digest_history = collections.Counter({self.board.digest(): 1})
+
         if log_file is not None:
             self.logger = logging.getLogger(name=log_filename)
             self.logger.addHandler(logging.StreamHandler(log_file))
@@ -229,19 +421,26 @@ class Game:
             # Apply STEAL action
             self.board.swap()
             self.last_coord = (-1, -1)
+            self._legal[:] = self._legal.T.copy()
 
         elif atype == _ACTION_PLACE:
             self._validate_place(action)
 
             # Apply PLACE action
             coord = tuple(aargs)
-            self.last_captures = self.board.place(player, coord)
+            self.last_captures = self.board.place(player, coord).captured
             self.last_coord = coord
+            self._update_legal(coord)
         else:
             # This should never happen, but good to be defensive
             raise self._illegal_action(action, f"Action not handled.")
 
+        # The game never takes back actions, so the board need not keep
+        # its undo trail
+        self.board.forget_undo()
+
         # End turn and check for game end conditions
+        self.moves.append(encode_action((atype, *aargs), self.board.n))
         self._turn_detect_end(player, action)
         
         # Log the action (if logging is enabled)
@@ -270,25 +469,55 @@ class Game:
         (_, r, q) = action
 
         # Cannot place outside board bounds
-        if not self.board.inside_bounds((r, q)):
+        n = self.board.n
+        if not (0 <= r < n and 0 <= q < n):
             self._illegal_action(action,
                 f"The PLACE action coordinate {(r, q)} is outside "
-                f"the bounds of the board (n = {self.board.n}). "
+                f"the bounds of the board (n = {n}). "
             )
 
+        # Otherwise the legal mask covers the remaining conditions, and
+        # only needs to be unpacked (for the message) if it rules this out
+        if self._legal[r, q]:
+            return
+
         # Cannot place token in center of the board on the first move
-        if self.nturns == 0 and r * 2 == q * 2 == self.board.n - 1:
+        if self.nturns == 0 and r * 2 == q * 2 == n - 1:
             self._illegal_action(action,
                 "The PLACE action is not permitted in the center cell of "
                 "the board on the first move of the game. "
             )
 
         # Cannot place on top of an existing board token
-        if self.board.is_occupied((r, q)):
-            self._illegal_action(action,
-                f"The PLACE action coordinate {(r, q)} is already "
-                "occupied. "
-            )
+        self._illegal_action(action,
+            f"The PLACE action coordinate {(r, q)} is already "
+            "occupied. "
+        )
+
+    def _update_legal(self, coord):
+        """
+        Update the legal PLACE mask after placing a token at coord.
+        """
+        self._legal[coord] = False
+        for captured in self.last_captures:
+            self._legal[captured] = True
+        if self.nturns == 0 and self.board.n % 2 == 1:
+            # The centre cell is legal again after the first move
+            centre = self.board.n // 2
+            self._legal[centre, centre] = not self.board.is_occupied(
+                (centre, centre))
+
+    def legal_actions(self):
+        """
+        Return a (read-only) boolean array of shape (n, n) marking the
+        cells where the current player may PLACE a token. The array is
+        kept up to date as the game progresses, so this is O(1) (the view
+        is made on each call, so it also tracks copies of the game). Note
+        that STEAL is also legal on the second turn of the game.
+        """
+        view = self._legal.view()
+        view.flags.writeable = False
+        return view
 
     def _illegal_action(self, action, message):
         """
@@ -298,7 +527,8 @@ class Game:
         self.logger.info(f"error: {player}: illegal action {action!r}")
         self.close()
         raise IllegalActionException(
-            f"{message.strip()} See the specification/game rules for details."
+            f"{message.strip()} See the specification/game rules for details.",
+            player,
         )
 
     def _turn_player(self):
@@ -314,24 +544,26 @@ class Game:
         """
         # Register turn
         self.nturns += 1
-        self.history[self.board.digest()] += 1
+        self.history[self.board.zobrist] += 1
+        if self.digest_history is not None:
+            self._verify_hash()
 
         # Game end conditions
 
         # Condition 1: player forms a continuous path spanning board (win).
-        # check reachable coords from just-placed token to detect winning path
+        # the board tracks connectivity incrementally, so this is just a
+        # union-find root comparison between the player's two board edges
         # NOTE: No point checking this while total turns is less than 2n - 1
         if self.nturns >= (self.board.n * 2) - 1:
-            _, r, q = action
-            reachable = self.board.connected_coords((r, q))
-            axis_vals = [coord[_PLAYER_AXIS[player]] for coord in reachable]
-            if min(axis_vals) == 0 and max(axis_vals) == self.board.n - 1:
+            if self.board.connects_edges(player):
+                # The winning path must run through the just-placed token
+                _, r, q = action
                 self.result = "winner: " + player
-                self.result_cluster = set(reachable)
+                self.result_cluster = set(self.board.connected_coords((r, q)))
                 return
 
         # Condition 2: the same state has occurred too many times (draw)
-        if self.history[self.board.digest()] >= _MAX_REPEAT_STATES:
+        if self.history[self.board.zobrist] >= _MAX_REPEAT_STATES:
             self.result = f"draw: same game state occurred \
                 {_MAX_REPEAT_STATES} times"
             return
@@ -344,6 +576,23 @@ class Game:
         # No end conditions met, game continues
         return
 
+    def _verify_hash(self):
+        """
+        Check the board's incremental hash against a full recomputation,
+        and check that counting states by hash agrees with counting them
+        by full digest (i.e., no collisions). Raises AssertionError if not.
+        """
+        self.digest_history[self.board.digest()] += 1
+        if self.board.zobrist != self.board.zobrist_full():
+            raise AssertionError(
+                f"incremental board hash out of date on turn {self.nturns}"
+            )
+        if self.history[self.board.zobrist] != \
+                self.digest_history[self.board.digest()]:
+            raise AssertionError(
+                f"board hash collision detected on turn {self.nturns}"
+            )
+
     def over(self):
         """
         True iff the game has terminated.
@@ -367,6 +616,15 @@ class Game:
             self.handler.close()
             self.logger.removeHandler(self.handler)
             self.handler = None
+        if self.record_filename is not None:
+            # Closing before there is a result means the game was aborted
+            if self.result is None:
+                code = RESULT_CODES["error"]
+            else:
+                code = result_code(self.result)
+            write_record(self.record_filename, self.board.n,
+                self.player_names, code, self.moves)
+            self.record_filename = None
 
 
 # # #
@@ -379,70 +637,70 @@ _CAPTURE_SYM = 'X'
 _POINT_TO = lambda s: f">{s}<"
 _STAR_TO = lambda s: f"*{s}*"
 
-def _RENDER(
-    game,
-    message="",
-    use_debugboard=False,
-    use_colour=False,
-    use_unicode=False,
-):
+# Unicode symbols for cell contents
+_UNICODE_SYMBOLS = {
+    _RED_SYM: " 🍓  ",
+    _BLUE_SYM: " 🍇  ",
+    _POINT_TO(_RED_SYM): "▶🍓◀ ",
+    _POINT_TO(_BLUE_SYM): "▶🍇◀ ",
+    _STAR_TO(_RED_SYM): "⯌🍓⯌ ",
+    _STAR_TO(_BLUE_SYM): "⯌🍇⯌ ",
+    _CAPTURE_SYM: " 🐸  "
+}
+
+# Cell value (and colour) for each internal token type
+_TOKEN_SYMS = ["", _RED_SYM, _BLUE_SYM]
+
+_STITCH_PATTERN = ".-'-._"
+_EDGE_COL_LEN = 3
+_V_DIVIDER = "|"
+_H_SPACING = len(_STITCH_PATTERN)
+
+
+def _apply_ansi(str, bold=True, color=None):
     """
-    Create and return a representation of board for printing.
+    Helper function to apply ansi formatting.
     """
-    board = game.board
+    bold_code = "\033[1m" if bold else ""
+    color_code = ""
+    if color == "r":
+        color_code = "\033[31m"
+    if color == "b":
+        color_code = "\033[34m"
+    return f"{bold_code}{color_code}{str}\033[0m"
 
-    # Should we use 😂 ?
-    _symbol_map = {}
-    if use_unicode:
-        _symbol_map = {
-            _RED_SYM: " 🍓  ",
-            _BLUE_SYM: " 🍇  ",
-            _POINT_TO(_RED_SYM): "▶🍓◀ ",
-            _POINT_TO(_BLUE_SYM): "▶🍇◀ ",
-            _STAR_TO(_RED_SYM): "⯌🍓⯌ ",
-            _STAR_TO(_BLUE_SYM): "⯌🍇⯌ ",
-            _CAPTURE_SYM: " 🐸  "
-        }
-
-    stitch_pattern = ".-'-._"
-    edge_col_len = 3
-    v_divider = "|"
-    h_spacing = len(stitch_pattern)
-    output = message + "\n"
 
-    if use_debugboard:
-        output += "DEBUG: Captured coords: "
-        output += str(game.last_captures)
-        output += "\n\n"
+@lru_cache(maxsize=None)
+def _render_cell(value, color, use_colour, use_unicode):
+    """
+    Printable contents of a single cell (cached per cell value and colour).
+    """
+    contents = use_unicode and _UNICODE_SYMBOLS.get(value) or \
+        value.center(_H_SPACING - 1)
+    return _apply_ansi(contents, color=color) if use_colour else contents
 
-    # Helper functions to apply ansi formatting (selectively)
-    def _apply_ansi(str, bold=True, color=None):
-        bold_code = "\033[1m" if bold else ""
-        color_code = ""
-        if color == "r":
-            color_code = "\033[31m"
-        if color == "b":
-            color_code = "\033[34m"
-        return f"{bold_code}{color_code}{str}\033[0m"
 
+@lru_cache(maxsize=None)
+def _render_template(n, use_colour, use_unicode):
+    """
+    Build (and cache) a board picture for size n with a "{}" format field
+    in place of each cell's contents, in print order (rows from r = n - 1
+    down to 0, then columns from q = 0 up to n - 1).
+    """
     apply_ansi = _apply_ansi if use_colour else lambda str, **_: str
 
-    # Generator to repeat pattern string (char by char) infinitely
-    def repeat(pattern):
-        while True:
-            for c in pattern:
-                yield c
-
     # Generate stitching pattern given some offset and length
     def stitching(offset, length):
-        return "".join(islice(repeat(stitch_pattern), offset, length))
+        repeats = _STITCH_PATTERN * (length // _H_SPACING + 1)
+        return repeats[offset:length]
 
     # Loop through each row i from top (print ordering)
     # Note that n - i - 1 is equivalent to r in axial coordinates
-    for i in range(board.n):
-        x_padding = (board.n - i - 1) * int(h_spacing / 2)
-        stitch_length = (board.n * h_spacing) - 1 + \
-            (int(h_spacing / 2) + 1 if i > 0 else 0)
+    output = ""
+    for i in range(n):
+        x_padding = (n - i - 1) * int(_H_SPACING / 2)
+        stitch_length = (n * _H_SPACING) - 1 + \
+            (int(_H_SPACING / 2) + 1 if i > 0 else 0)
         mid_stitching = stitching(0, stitch_length)
 
         # Handle coloured borders for ansi outputs
@@ -451,39 +709,69 @@ def _RENDER(
             mid_stitching = apply_ansi(mid_stitching, color="r")
         else:
             mid_stitching = \
-                apply_ansi(mid_stitching[:edge_col_len], color="b") + \
-                mid_stitching[edge_col_len:-edge_col_len] + \
-                apply_ansi(mid_stitching[-edge_col_len:], color="b")
+                apply_ansi(mid_stitching[:_EDGE_COL_LEN], color="b") + \
+                mid_stitching[_EDGE_COL_LEN:-_EDGE_COL_LEN] + \
+                apply_ansi(mid_stitching[-_EDGE_COL_LEN:], color="b")
 
         output += " " * (x_padding + 1) + mid_stitching + "\n"
-        output += " " * x_padding + apply_ansi(v_divider, color="b")
-
-        # Loop through each column j from left to right
-        # Note that j is equivalent to q in axial coordinates
-        for j in range(board.n):
-            coord = (board.n - i - 1, j)
-            color = value = "" if board[coord] == None else \
-                (_RED_SYM if board[coord] == "red" else _BLUE_SYM)
-            if use_debugboard:
-                if coord == game.last_coord:
-                    value = _POINT_TO(value)
-                elif coord in game.result_cluster:
-                    value = _STAR_TO(value)
-                if coord in game.last_captures:
-                    value = _CAPTURE_SYM
-            contents = _symbol_map.get(value) or value.center(h_spacing - 1)
-            contents = apply_ansi(contents, color=color)
-            output += contents + (v_divider if j < board.n - 1 else "")
-        output += apply_ansi(v_divider, color="b")
+        output += " " * x_padding + apply_ansi(_V_DIVIDER, color="b")
+        output += _V_DIVIDER.join(["{}"] * n)
+        output += apply_ansi(_V_DIVIDER, color="b")
         output += "\n"
-    
+
     # Final/lower stitching (note use of offset here)
-    stitch_length = (board.n * h_spacing) + int(h_spacing / 2)
-    lower_stitching = stitching(int(h_spacing / 2) - 1, stitch_length)
+    stitch_length = (n * _H_SPACING) + int(_H_SPACING / 2)
+    lower_stitching = stitching(int(_H_SPACING / 2) - 1, stitch_length)
     output += apply_ansi(lower_stitching, color="r") + "\n"
 
     return output
-        
+
+
+def _RENDER(
+    game,
+    message="",
+    use_debugboard=False,
+    use_colour=False,
+    use_unicode=False,
+):
+    """
+    Create and return a representation of board for printing.
+    """
+    board = game.board
+    n = board.n
+    output = message + "\n"
+
+    if use_debugboard:
+        output += "DEBUG: Captured coords: "
+        output += str(game.last_captures)
+        output += "\n\n"
+
+    # Fill a cached template with cell contents (in print order) directly
+    # from the board's internal token types
+    cells = [_render_cell(sym, sym, use_colour, use_unicode) 
+        for sym in _TOKEN_SYMS]
+    tokens = board.token_types()
+    contents = []
+    for r in range(n - 1, -1, -1):
+        contents.extend([cells[t] for t in tokens[r * n:(r + 1) * n]])
+
+    # Overwrite the few cells with extra debugging information
+    if use_debugboard:
+        marked = {}
+        for coord in game.result_cluster:
+            marked[coord] = _STAR_TO
+        marked[game.last_coord] = _POINT_TO
+        for coord in game.last_captures:
+            marked[coord] = lambda _: _CAPTURE_SYM
+        for (r, q), mark in marked.items():
+            if 0 <= r < n and 0 <= q < n:
+                sym = _TOKEN_SYMS[tokens[r * n + q]]
+                contents[(n - r - 1) * n + q] = _render_cell(
+                    mark(sym), sym, use_colour, use_unicode)
+
+    return output + _render_template(n, use_colour, use_unicode).format(
+        *contents)
+
 
 def _FORMAT_ACTION(action):
     atype, *aargs = action
@@ -27,6 +27,14 @@ class StarLog:
     * pad  (='  ') the string used to indent at each each depth level.
     * ansi (=False) True iff ANSI control codes should be allowed in
         clearing the terminal.
+    * buffered (=False) True iff output should be held back until `flush`
+        is called (e.g., once per turn), then written all at once.
+
+    Messages are only formatted if they are going to be logged: any
+    callable message components are called (with no arguments) to get the
+    component, and if the first component is a string containing '%' and
+    there are others, they are formatted into it %-style (e.g.,
+    `comment("turn %d", turn)`). Otherwise, components are joined by `sep`.
     """
 
     def __init__(
@@ -37,12 +45,15 @@ class StarLog:
         star="*",
         pad="  ",
         ansi=False,
+        buffered=False,
     ):
         self.level = level
         self.timefn = timefn
         self.star = star
         self.pad = pad
+        self.file = file
         self.kwargs = {"file": file, "flush": True}
+        self.buffer = [] if buffered else None
         if ansi:
             self.clear = "\033[H\033[2J"  # ANSI code to clear the terminal
         else:
@@ -57,7 +68,7 @@ class StarLog:
             return
         # Combine the message components
         sep = kwargs.get("sep", " ")
-        msg = sep.join(map(str, args))
+        msg = _format(args, sep)
         # Skip empty messages
         if not msg:
             return
@@ -70,9 +81,23 @@ class StarLog:
             start = self.clear + start
         if self.timefn is not None:
             start += sep + f"[{self.timefn()}]"
+        if self.buffer is not None:
+            end = kwargs.get("end", "\n")
+            for line in msg.splitlines():
+                self.buffer.append(start + sep + line + end)
+            return
         for line in msg.splitlines():
             _print(start, line, **kwargs, **self.kwargs)
 
+    def flush(self):
+        """
+        Write out any buffered output (in buffered mode).
+        """
+        if self.buffer:
+            self.file.write("".join(self.buffer))
+            self.file.flush()
+            self.buffer.clear()
+
     # Shortcuts
     def print(self, *args, **kwargs):
         """Shortcut to log at level 0 (always)."""
@@ -87,6 +112,16 @@ class StarLog:
         self.log(*args, level=2, **kwargs)
 
 
+def _format(args, sep):
+    """
+    Combine message components (see StarLog).
+    """
+    args = [arg() if callable(arg) else arg for arg in args]
+    if len(args) > 1 and isinstance(args[0], str) and "%" in args[0]:
+        return args[0] % tuple(args[1:])
+    return sep.join(map(str, args))
+
+
 """
 Allow global use of a single configurable starlog
 """
@@ -113,8 +148,11 @@ def config(**kwargs):
     * pad  (='  ') the string used to indent at each each depth level.
     * ansi (=False) True iff ANSI control codes should be allowed in
         clearning the terminal.
+    * buffered (=False) True iff output should be held back until `flush`
+        is called, then written all at once.
     """
     global _DEFAULT_STARLOG
+    _DEFAULT_STARLOG.flush()
     _DEFAULT_STARLOG = StarLog(**kwargs)
 
 
@@ -138,3 +176,10 @@ def comment(*args, **kwargs):
 def debug(*args, **kwargs):
     """Shortcut to log at level 2 (debug)."""
     log(*args, level=2, **kwargs)
+
+
+def flush():
+    """
+    See StarLog.flush.
+    """
+    _DEFAULT_STARLOG.flush()
@@ -3,10 +3,11 @@ Driver program to instantiate two Player classes and begin a game
 between them.
 """
 
-from referee.log import config, print, comment, _print
-from referee.game import play, IllegalActionException
-from referee.player import PlayerWrapper
+from referee.log import config, print, comment, flush, _print
+from referee.game import play, IllegalActionException, BOARD_TYPES
 from referee.player import ResourceLimitException, set_space_line
+from referee.protocol import player_wrapper_class
+from referee.telemetry import open_sink
 from referee.options import get_options
 
 
@@ -17,25 +18,49 @@ def main():
 
     # Create a star-log for controlling the format of output from within this
     # program
-    config(level=options.verbosity, ansi=options.use_colour)
+    config(
+        level=options.verbosity,
+        ansi=options.use_colour,
+        buffered=options.buffer,
+    )
     comment("all messages printed by the referee after this begin with *")
     comment("(any other lines of output must be from your Player class).")
     comment()
 
+    # Players run inside the referee process unless isolation is requested
+    # (or they are served at a socket address)
+    players = []
+    telemetry = None
+
     try:
+        if options.telemetry is not None:
+            telemetry = open_sink(options.telemetry)
+
         # Import player classes
-        p1 = PlayerWrapper(
+        Wrapper = player_wrapper_class(options.player1_loc, options.isolate)
+        p1 = Wrapper(
             "player 1",
             options.player1_loc,
             time_limit=options.time,
             space_limit=options.space,
+            gc_policy=options.gc,
+            move_time=options.move_time,
+            wall_time=options.wall_time,
+            telemetry=telemetry,
         )
-        p2 = PlayerWrapper(
+        players.append(p1)
+        Wrapper = player_wrapper_class(options.player2_loc, options.isolate)
+        p2 = Wrapper(
             "player 2",
             options.player2_loc,
             time_limit=options.time,
             space_limit=options.space,
+            gc_policy=options.gc,
+            move_time=options.move_time,
+            wall_time=options.wall_time,
+            telemetry=telemetry,
         )
+        players.append(p2)
 
         # We'll start measuring space usage from now, after all
         # library imports should be finished:
@@ -51,10 +76,19 @@ def main():
             use_colour=options.use_colour,
             use_unicode=options.use_unicode,
             log_filename=options.logfile,
+            record_filename=options.record,
+            board_cls=BOARD_TYPES[options.board],
         )
         # Display the final result of the game to the user.
         comment("game over!", depth=-1)
         print(result)
+        for player in players:
+            policy = player.timer.gc_policy
+            comment(
+                f"{player.name}: garbage collection took "
+                f"{player.timer.gc_clock:.3f}s (wall time, gc policy "
+                + (f"'{policy}')" if policy is not None else "n/a)")
+            )
 
     # In case the game ends in an abnormal way, print a clean error
     # message for the user (rather than a trace).
@@ -71,3 +105,9 @@ def main():
         comment(e)
     # If it's another kind of error then it might be coming from the player
     # itself? Then, a traceback will be more helpful. Don't handle this.
+    finally:
+        for player in players:
+            player.close()
+        if telemetry is not None:
+            telemetry.close()
+        flush()
@@ -4,7 +4,9 @@ Provide a command-line argument parsing function using argparse
 
 -----------------------------------------------------------------------------
 usage: referee [-h] [-V] [-d [delay]] [-s [space_limit]] [-t [time_limit]]
-               [-D | -v [{0,1,2,3}]] [-l [LOGFILE]] [-c | -C] [-u | -a]
+               [-m [move_time]] [-w [wall_time]] [-D | -v [{0,1,2,3}]]
+               [-l [LOGFILE]] [-c | -C] [-u | -a] [-b {numpy,bitboard}] [-i]
+               [-g GC_POLICY] [-r [RECORD]] [-T [TELEMETRY]] [-B]
                red blue n
 
 conduct a game of Cachex between 2 Player classes.
@@ -27,6 +29,10 @@ player package/class specifications (positional args):
   class with some other name you can put the alternative class name after a
   colon symbol ':' (e.g. 'your_team_name:DifferentPlayer').
 
+  Alternatively, a player can be an address where a player is being served
+  over a socket (e.g. 'tcp://localhost:5000' or 'unix:///tmp/player.sock';
+  see `python -m referee serve`).
+
   n                     size of the game board
   red                   location of Red's Player class (e.g. package name)
   blue                  location of Blue's Player class (e.g. package name)
@@ -41,6 +47,13 @@ optional arguments:
                         limit on memory space (float, MB) for each player.
   -t [time_limit], --time [time_limit]
                         limit on CPU time (float, seconds) for each player.
+  -m [move_time], --move-time [move_time]
+                        limit on wall-clock time (float, seconds) for each
+                        player's move. Players that run out are stopped.
+  -w [wall_time], --wall-time [wall_time]
+                        limit on total wall-clock time (float, seconds) for
+                        each player over the game. Players that run out are
+                        stopped.
   -D, --debug           switch to printing the debug board (with
                         more information) (equivalent to -v or -v3).
   -v [{0,1,2,3}], --verbosity [{0,1,2,3}]
@@ -60,12 +73,37 @@ optional arguments:
                         (default behaviour is automatic based on system).
   -a, --ascii           force basic display using only ASCII characters (see
                         -u).
+  -b {numpy,bitboard}, --board {numpy,bitboard}
+                        board representation used by the referee to
+                        validate and apply actions (default: numpy).
+  -i, --isolate         run each player in its own process, with separate
+                        time and (resident) space accounting per player.
+  -g GC_POLICY, --gc GC_POLICY
+                        garbage collection before each player call (off
+                        the clock). always: full collection (default);
+                        gen0: youngest generation only; every:K: full
+                        collection every K calls; off: none (freezing
+                        objects that survive the player's init instead).
+  -r [RECORD], --record [RECORD]
+                        if you supply this flag the referee will write a
+                        compact binary record of the game to a file named
+                        RECORD (default: game.cxr), which can be checked
+                        with `python -m referee replay`.
+  -T [TELEMETRY], --telemetry [TELEMETRY]
+                        if you supply this flag the referee will write
+                        metrics for each player call (CPU, wall-clock and
+                        gc time, space usage, action) to a file named
+                        TELEMETRY (default: telemetry.jsonl; CSV if the name
+                        ends in .csv).
+  -B, --buffer          buffer the referee's output, writing it out once
+                        per turn (rather than line by line).
 -----------------------------------------------------------------------------
 """
 
 import sys
 import argparse
-from referee.game import GAME_NAME, COLOURS, NUM_PLAYERS
+from referee.game import GAME_NAME, COLOURS, NUM_PLAYERS, BOARD_TYPES
+from referee.player import parse_gc_policy
 
 # Program information:
 PROGRAM = "referee"
@@ -92,6 +130,10 @@ SPACE_LIMIT_DEFAULT = 0  # signifying no limit
 SPACE_LIMIT_NOVALUE = 100.0  # MB (each)
 TIME_LIMIT_DEFAULT = 0  # signifying no limit
 TIME_LIMIT_NOVALUE = 60.0  # seconds (each)
+MOVE_TIME_DEFAULT = 0  # signifying no limit
+MOVE_TIME_NOVALUE = 5.0  # seconds (each move)
+WALL_TIME_DEFAULT = 0  # signifying no limit
+WALL_TIME_NOVALUE = 120.0  # seconds (each)
 
 VERBOSITY_LEVELS = 4
 VERBOSITY_DEFAULT = 2  # normal level, normal board
@@ -100,6 +142,16 @@ VERBOSITY_NOVALUE = 3  # highest level, debug board
 LOGFILE_DEFAULT = None
 LOGFILE_NOVALUE = "game.log"
 
+RECORD_DEFAULT = None
+RECORD_NOVALUE = "game.cxr"
+
+TELEMETRY_DEFAULT = None
+TELEMETRY_NOVALUE = "telemetry.jsonl"
+
+BOARD_DEFAULT = "numpy"
+
+GC_POLICY_DEFAULT = "always"
+
 PKG_SPEC_HELP = """
 The first argument is the size of the game board to play on (3 <= n <= 15).
 The next two arguments are 'package specifications'. These specify which
@@ -117,6 +169,10 @@ Either way, the referee will attempt to import the specified package/module
 and then load a class named 'Player'. If you want the referee to look for a
 class with some other name you can put the alternative class name after a
 colon symbol ':' (e.g. 'your_team_name:DifferentPlayer').
+
+Alternatively, a player can be an address where a player is being served
+over a socket (e.g. 'tcp://localhost:5000' or 'unix:///tmp/player.sock';
+see `python -m referee serve`).
 """.format(
     NUM_PLAYERS
 )
@@ -199,6 +255,28 @@ def get_options():
         const=TIME_LIMIT_NOVALUE,
         help="limit on CPU time (float, seconds) for each player.",
     )
+    optionals.add_argument(
+        "-m",
+        "--move-time",
+        metavar="move_time",
+        type=float,
+        nargs="?",
+        default=MOVE_TIME_DEFAULT,
+        const=MOVE_TIME_NOVALUE,
+        help="limit on wall-clock time (float, seconds) for each player's "
+        "move. Players that run out are stopped.",
+    )
+    optionals.add_argument(
+        "-w",
+        "--wall-time",
+        metavar="wall_time",
+        type=float,
+        nargs="?",
+        default=WALL_TIME_DEFAULT,
+        const=WALL_TIME_NOVALUE,
+        help="limit on total wall-clock time (float, seconds) for each "
+        "player over the game. Players that run out are stopped.",
+    )
 
     verbosity_group = optionals.add_mutually_exclusive_group()
     verbosity_group.add_argument(
@@ -235,6 +313,34 @@ def get_options():
         "(default: %(const)s).",
     )
 
+    optionals.add_argument(
+        "-r",
+        "--record",
+        type=str,
+        nargs="?",
+        default=RECORD_DEFAULT,
+        const=RECORD_NOVALUE,
+        metavar="RECORD",
+        help="if you supply this flag the referee will write a compact "
+        "binary record of the game to a file named %(metavar)s "
+        "(default: %(const)s), which can be checked with `python -m "
+        "referee replay`.",
+    )
+
+    optionals.add_argument(
+        "-T",
+        "--telemetry",
+        type=str,
+        nargs="?",
+        default=TELEMETRY_DEFAULT,
+        const=TELEMETRY_NOVALUE,
+        metavar="TELEMETRY",
+        help="if you supply this flag the referee will write metrics for "
+        "each player call (CPU, wall-clock and gc time, space usage, "
+        "action) to a file named %(metavar)s (default: %(const)s; CSV if "
+        "the name ends in .csv).",
+    )
+
     colour_group = optionals.add_mutually_exclusive_group()
     colour_group.add_argument(
         "-c",
@@ -265,6 +371,43 @@ def get_options():
         help="force basic display using only ASCII characters (see -u).",
     )
 
+    optionals.add_argument(
+        "-b",
+        "--board",
+        choices=BOARD_TYPES,
+        default=BOARD_DEFAULT,
+        help="board representation used by the referee to validate and "
+        "apply actions (default: %(default)s).",
+    )
+
+    optionals.add_argument(
+        "-i",
+        "--isolate",
+        action="store_true",
+        help="run each player in its own process, with separate time and "
+        "(resident) space accounting per player.",
+    )
+
+    optionals.add_argument(
+        "-g",
+        "--gc",
+        metavar="GC_POLICY",
+        type=gc_policy,
+        default=GC_POLICY_DEFAULT,
+        help="garbage collection before each player call (off the clock). "
+        "always: full collection (default); gen0: youngest generation only; "
+        "every:K: full collection every K calls; off: none (freezing "
+        "objects that survive the player's init instead).",
+    )
+
+    optionals.add_argument(
+        "-B",
+        "--buffer",
+        action="store_true",
+        help="buffer the referee's output, writing it out once per turn "
+        "(rather than line by line).",
+    )
+
     args = parser.parse_args()
 
     # post-processing to combine mutually exclusive options
@@ -297,19 +440,37 @@ def get_options():
 
 class PackageSpecAction(argparse.Action):
     def __call__(self, parser, namespace, values, option_string=None):
-        pkg_spec = values
+        # save the result in the arguments namespace as a tuple
+        setattr(namespace, self.dest, package_spec(values))
 
-        # detect alternative class:
-        if ":" in pkg_spec:
-            pkg, cls = pkg_spec.split(":", maxsplit=1)
-        else:
-            pkg = pkg_spec
-            cls = "Player"
 
-        # try to convert path to module name
-        mod = pkg.strip("/\\").replace("/", ".").replace("\\", ".")
-        if mod.endswith(".py"):  # NOTE: Assumes submodule is not named `py`.
-            mod = mod[:-3]
+def gc_policy(text):
+    """
+    Validate a garbage collection policy (see referee.player).
+    """
+    parse_gc_policy(text)
+    return text
 
-        # save the result in the arguments namespace as a tuple
-        setattr(namespace, self.dest, (mod, cls))
+
+def package_spec(pkg_spec):
+    """
+    Convert a player package specification into a (module, class) tuple.
+    Socket addresses (see referee.protocol) are kept whole, as (address,
+    None).
+    """
+    if "://" in pkg_spec:
+        return (pkg_spec, None)
+
+    # detect alternative class:
+    if ":" in pkg_spec:
+        pkg, cls = pkg_spec.split(":", maxsplit=1)
+    else:
+        pkg = pkg_spec
+        cls = "Player"
+
+    # try to convert path to module name
+    mod = pkg.strip("/\\").replace("/", ".").replace("\\", ".")
+    if mod.endswith(".py"):  # NOTE: Assumes submodule is not named `py`.
+        mod = mod[:-3]
+
+    return (mod, cls)
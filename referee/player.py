@@ -6,10 +6,25 @@ being executed, etc.
 
 import gc
 import time
+import signal
+import asyncio
+import inspect
+import threading
 import importlib
+import traceback
+import multiprocessing
+from types import SimpleNamespace
+from functools import lru_cache
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # (not available on windows)
+    resource = None
 
 from referee.log import comment, print
 from referee.game import NUM_PLAYERS
+from referee.telemetry import CallMetrics
 
 
 class PlayerWrapper:
@@ -20,19 +35,33 @@ class PlayerWrapper:
     * `.action()` and `.update()` methods just delegate to the real Player's
         methods of the same name.
     Each method enforces resource limits on the real Player's computation.
+    Before each `.action()` and `.turn()` call, the real Player's
+    `time_remaining` attribute is set to the wall-clock time (seconds) it
+    may take before being stopped (or None, if unlimited).
+    For `referee.game.play_async`, each method has a coroutine variant
+    (`.init_async()` etc.), under which the real Player's `action` and
+    `turn` methods may be coroutine functions (see `_invoke_async`).
+    Metrics for each call are written to the `telemetry` sink, if given (see
+    referee.telemetry).
     """
 
-    def __init__(self, name, player_loc, time_limit=None, space_limit=None):
+    def __init__(self, name, player_loc, time_limit=None, space_limit=None,
+            gc_policy="always", move_time=None, wall_time=None,
+            telemetry=None):
         self.name = name
+        self.label = name
+        self.telemetry = telemetry
 
         # create some context managers for resource limiting
-        self.timer = _CountdownTimer(time_limit, self.name)
+        self.timer = _CountdownTimer(time_limit, self.name, gc_policy)
         if space_limit is not None:
             space_limit *= NUM_PLAYERS
         self.space = _MemoryWatcher(space_limit)
+        self.wall = _WallClock(move_time, wall_time, self.name)
 
         # import the Player class from given package
         player_pkg, player_cls = player_loc
+        self.location = f"{player_pkg}:{player_cls}"
         comment(
             f"importing {self.name}'s player class '{player_cls}' "
             f"from package '{player_pkg}'"
@@ -40,39 +69,286 @@ class PlayerWrapper:
         self.Player = _load_player_class(player_pkg, player_cls)
 
     def init(self, colour, n):
-        self.colour = colour
-        self.name += f" ({colour})"
-        player_cls = str(self.Player).strip("<class >")
-        comment(f"initialising {self.colour} player as a {player_cls}")
-        with self.space, self.timer:
-            # construct/initialise the player class
-            self.player = self.Player(colour, n)
-        comment(self.timer.status(), depth=1)
-        comment(self.space.status(), depth=1)
+        self._announce_init(colour)
+        # construct/initialise the player class
+        with self._recording("init"):
+            self._invoke("init", colour, n)
+        self._report("init")
 
     def action(self):
-        comment(f"asking {self.name} for next action...")
-        with self.space, self.timer:
-            # ask the real player
-            action = self.player.action()
-        comment(f"{self.name} returned action: {action!r}", depth=1)
-        comment(self.timer.status(), depth=1)
-        comment(self.space.status(), depth=1)
+        comment("asking %s for next action...", self.name)
+        # ask the real player
+        with self._recording("action") as call:
+            action = call.action = self._invoke("action")
+        self._report("action", action)
         # give back the result
         return action
 
     def turn(self, player, action):
-        comment(f"updating {self.name} with actions...")
-        with self.space, self.timer:
-            # forward to the real player
-            self.player.turn(player, action)
-        comment(self.timer.status(), depth=1)
-        comment(self.space.status(), depth=1)
+        comment("updating %s with actions...", self.name)
+        # forward to the real player
+        with self._recording("turn", action):
+            self._invoke("turn", player, action)
+        self._report("turn")
+
+    async def init_async(self, colour, n):
+        self._announce_init(colour)
+        with self._recording("init"):
+            await self._invoke_async("init", colour, n)
+        self._report("init")
+
+    async def action_async(self):
+        comment("asking %s for next action...", self.name)
+        with self._recording("action") as call:
+            action = call.action = await self._invoke_async("action")
+        self._report("action", action)
+        return action
+
+    async def turn_async(self, player, action):
+        comment("updating %s with actions...", self.name)
+        with self._recording("turn", action):
+            await self._invoke_async("turn", player, action)
+        self._report("turn")
+
+    def _announce_init(self, colour):
+        self.colour = colour
+        self.name += f" ({colour})"
+        player_cls = str(self.Player).strip("<class >")
+        comment("initialising %s player as a %s", self.colour, player_cls)
+
+    def _report(self, method, action=None):
+        """
+        Print metrics for the last call.
+        """
+        if method == "action":
+            comment("%s returned action: %r", self.name, action, depth=1)
+        comment(self.timer.status, depth=1)
+        comment(self.space.status, depth=1)
+
+    def close(self):
+        """
+        Release any resources held for the real player.
+        """
+        if self.timer.gc_mode == "off":
+            # let objects frozen after init be collected again
+            gc.unfreeze()
+
+    @contextmanager
+    def _recording(self, method, action=None):
+        """
+        Context manager writing metrics for a call made within it to the
+        telemetry sink (if any), however the call ends: the outcome is "ok",
+        "limit" (if it exceeded a resource limit) or "error". The action
+        returned by an "action" call can be set as the `action` attribute
+        of the value it yields.
+        """
+        call = SimpleNamespace(action=action, outcome="error")
+        try:
+            yield call
+            call.outcome = "ok"
+        except ResourceLimitException:
+            call.outcome = "limit"
+            raise
+        finally:
+            if self.telemetry is not None:
+                self.telemetry.write(CallMetrics(
+                    player=self.label,
+                    colour=self.colour,
+                    call=method,
+                    cpu=self.timer.last,
+                    wall=self.wall.last,
+                    gc=self.timer.gc_last,
+                    space_delta=self.space.delta,
+                    space_peak=self.space.rss_peak,
+                    action=call.action,
+                    outcome=call.outcome,
+                ))
+
+    def _invoke(self, method, *args):
+        """
+        Call the real player's method (or construct the player, for "init")
+        while enforcing resource limits, and return the result.
+        """
+        try:
+            with self.space, self.timer, self.wall:
+                if method == "init":
+                    self.player = self.Player(*args)
+                    return None
+                self.player.time_remaining = self.wall.budget()
+                return getattr(self.player, method)(*args)
+        except _Overrun:
+            # (the watchdog went off just as the call returned)
+            self.wall.count(0, overrun=True)
+
+    async def _invoke_async(self, method, *args):
+        """
+        As `_invoke`, but if the real player's method is a coroutine
+        function, await it within the time and space accounting, stopping
+        it (with asyncio.wait_for) if it runs out of wall-clock time. Other
+        methods (including the constructor) are called as by `_invoke`, as
+        they block the event loop anyway.
+
+        NOTE: Like wall-clock time, CPU time is measured for the whole
+        process, so both include any time other tasks (e.g. other games on
+        the same event loop, and their garbage collection) spend running
+        while the method is awaited.
+        """
+        if method == "init" or not inspect.iscoroutinefunction(
+                getattr(self.player, method)):
+            return self._invoke(method, *args)
+        budget = self.wall.budget()
+        overrun = False
+        # (set before entering, in case the space or time check raises; the
+        # clock is restarted after collecting garbage, as in _invoke)
+        start = time.perf_counter()
+        try:
+            with self.space, self.timer:
+                start = time.perf_counter()
+                self.player.time_remaining = budget
+                return await asyncio.wait_for(
+                    getattr(self.player, method)(*args), budget
+                )
+        except asyncio.TimeoutError:
+            overrun = True
+        finally:
+            self.wall.count(time.perf_counter() - start, overrun)
+
+
+class IsolatedPlayerWrapper(PlayerWrapper):
+    """
+    Variant of PlayerWrapper that runs the real Player in its own child
+    process (talking to it over a pipe) instead of inside the referee.
+    Each player's time and space usage is then measured by and for its own
+    process: CPU time via `resource.getrusage` and resident memory (RSS)
+    via procfs, so one player's allocations don't count against the other.
+    """
+
+    def __init__(self, name, player_loc, time_limit=None, space_limit=None,
+            gc_policy="always", move_time=None, wall_time=None,
+            telemetry=None):
+        self.name = name
+        self.label = name
+        self.telemetry = telemetry
+
+        # create some context managers for resource limiting (the space
+        # limit is not shared between players in this mode, and there is no
+        # other player's garbage to collect, so gc_policy is unused)
+        self.timer = _CountdownTimer(time_limit, self.name, None)
+        self.space = _MemoryWatcher(space_limit, self.name, shared=False)
+        self.wall = _WallClock(move_time, wall_time, self.name)
 
+        # start a child process to import and host the Player class
+        player_pkg, player_cls = player_loc
+        self.location = f"{player_pkg}:{player_cls}"
+        comment(
+            f"importing {self.name}'s player class '{player_cls}' "
+            f"from package '{player_pkg}' (in a separate process)"
+        )
+        self.Player = repr(f"{player_pkg}.{player_cls}")  # (for display)
+        self._conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_isolated_player_main,
+            args=(child_conn, player_loc),
+            daemon=True,
+        )
+        self._process.start()
+        child_conn.close()
+
+    def close(self):
+        """
+        Shut down the player's process.
+        """
+        if self._process.is_alive():
+            try:
+                self._conn.send(("close", None))
+            except (BrokenPipeError, OSError):
+                pass
+            self._process.join(timeout=1)
+            if self._process.is_alive():
+                self._process.kill()
+        self._conn.close()
+
+    def _invoke(self, method, *args):
+        """
+        Ask the player's process to call a method, then account for the
+        time and space that process reports having used. If the call runs
+        out of wall-clock time, the process is killed.
+        """
+        budget = self.wall.budget()
+        start = time.perf_counter()
+        try:
+            self._conn.send((method, budget, *args))
+            if budget is not None and not self._conn.poll(budget):
+                self._process.kill()
+                self.wall.count(time.perf_counter() - start, overrun=True)
+            status, result, elapsed, curr_usage, peak_usage = self._conn.recv()
+        except (EOFError, BrokenPipeError, ConnectionResetError):
+            raise RuntimeError(
+                f"{self.name}'s process exited unexpectedly "
+                f"(exit code {self._process.exitcode})"
+            )
+        if status == "error":
+            raise RuntimeError(
+                f"{self.name} raised an exception:\n{result}"
+            )
+        self.wall.count(time.perf_counter() - start)
+        self.timer.count(elapsed)
+        self.space.check(curr_usage, peak_usage)
+        return result
 
+
+    async def _invoke_async(self, method, *args):
+        """
+        As `_invoke`, but waiting for the player's process in a worker
+        thread, so as not to block the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, lambda: self._invoke(method, *args)
+        )
+
+
+def _isolated_player_main(conn, player_loc):
+    """
+    Entry point for an isolated player's process: import the Player class,
+    then serve method calls from the referee until asked to close. Each
+    reply reports the CPU time taken by the call, and current and peak
+    resident memory usage (relative to usage after importing the player).
+    """
+    Player = _load_player_class(*player_loc)
+    # NOTE: no need to collect garbage before each call here, as the only
+    # garbage in this process belongs to this player
+    base_usage, _ = _get_rss_usage()
+    player = None
+    while True:
+        method, time_remaining, *args = conn.recv()
+        if method == "close":
+            break
+        start = _cpu_time()
+        try:
+            if method == "init":
+                player = Player(*args)
+                result = None
+            else:
+                player.time_remaining = time_remaining
+                result = getattr(player, method)(*args)
+        except Exception:
+            conn.send(("error", traceback.format_exc(), 0, 0, 0))
+            continue
+        elapsed = _cpu_time() - start
+        curr_usage, peak_usage = _get_rss_usage()
+        conn.send(
+            ("ok", result, elapsed, curr_usage - base_usage,
+                peak_usage - base_usage)
+        )
+    conn.close()
+
+
+@lru_cache(maxsize=None)
 def _load_player_class(package_name, class_name):
     """
-    Load a Player class given the name of a package.
+    Load a Player class given the name of a package (cached, so repeated
+    games in one process only import each player once).
     """
     module = importlib.import_module(package_name)
     player_class = getattr(module, class_name)
@@ -85,6 +361,32 @@ def _load_player_class(package_name, class_name):
 class ResourceLimitException(Exception):
     """For when players exceed specified time / space limits."""
 
+    def __init__(self, message, player=None):
+        super().__init__(message)
+        self.player = player  # name of the offending player (if known)
+
+
+# Garbage collection policies for _CountdownTimer (see parse_gc_policy)
+GC_POLICIES = ("always", "gen0", "every:K", "off")
+
+
+def parse_gc_policy(text):
+    """
+    Parse a garbage collection policy into a (mode, k) tuple:
+    * "always"  -- full collection before every player call (default).
+    * "gen0"    -- collect only the youngest generation before every call.
+    * "every:K" -- full collection before every K-th call.
+    * "off"     -- no collections before calls; instead, freeze all objects
+                   surviving the player's initialisation (gc.freeze()) so
+                   that automatic collections don't keep scanning them.
+    """
+    mode, _, k = text.partition(":")
+    if mode == "every" and k.isdigit() and int(k) > 0:
+        return (mode, int(k))
+    if mode in ("always", "gen0", "off") and not k:
+        return (mode, 1)
+    raise ValueError(f"unknown gc policy {text!r} (use one of {GC_POLICIES})")
+
 
 class _CountdownTimer:
     """
@@ -93,48 +395,192 @@ class _CountdownTimer:
     * measures CPU time, not wall-clock time
     * unless time_limit is 0, throws an exception upon exiting the context
       after the allocated time has passed
+    * collects garbage (off the clock) before each section according to a
+      configurable policy, keeping track of the wall time this takes
     """
 
-    def __init__(self, time_limit, name):
+    def __init__(self, time_limit, name, gc_policy="always"):
         """
         Create a new countdown timer with time limit `limit`, in seconds
-        (0 for unlimited time)
+        (0 for unlimited time), and garbage collection policy `gc_policy`
+        (see parse_gc_policy; None for no policy, where the player's garbage
+        does not live in this process)
         """
         self.name = name
         self.limit = time_limit
         self.clock = 0
-        self._status = ""
-
-    def _set_status(self, status):
-        self._status = status
+        self.gc_policy = gc_policy
+        self.gc_mode, self.gc_every = (None, 1) if gc_policy is None \
+            else parse_gc_policy(gc_policy)
+        self.gc_clock = 0
+        self.gc_last = 0
+        self.calls = 0
+        self.last = None
 
     def status(self):
-        return self._status
+        """
+        Time usage status message (formatted on demand).
+        """
+        if self.last is None:
+            return ""
+        return (
+            f"time:  +{self.last:6.3f}s  (just elapsed)  "
+            f"{self.clock:7.3f}s  (game total)"
+        )
 
     def __enter__(self):
         # clean up memory off the clock
-        gc.collect()
+        gc_start = time.perf_counter()
+        self._collect()
+        self.gc_last = time.perf_counter() - gc_start
+        self.gc_clock += self.gc_last
         # then start timing
         self.start = time.process_time()
         return self  # unused
 
+    def _collect(self):
+        """
+        Collect garbage according to this timer's policy.
+        """
+        self.calls += 1
+        if self.gc_mode == "always":
+            gc.collect()
+        elif self.gc_mode == "gen0":
+            gc.collect(0)
+        elif self.gc_mode == "every":
+            if self.calls % self.gc_every == 0:
+                gc.collect()
+        elif self.gc_mode == "off":
+            # the first call is init; freeze whatever survived it
+            if self.calls == 2:
+                gc.freeze()
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         # accumulate elapsed time since __enter__
-        elapsed = time.process_time() - self.start
+        self.count(time.process_time() - self.start)
+
+    def count(self, elapsed):
+        """
+        Add `elapsed` seconds to the clock, checking the time limit.
+        """
+        self.last = elapsed
         self.clock += elapsed
-        self._set_status(
-            f"time:  +{elapsed:6.3f}s  (just elapsed)  "
-            f"{self.clock:7.3f}s  (game total)"
-        )
 
         # if we are limited, let's hope we aren't out of time!
         if self.limit is not None and self.limit > 0:
             if self.clock > self.limit:
                 raise ResourceLimitException(
-                    f"{self.name} exceeded available time"
+                    f"{self.name} exceeded available time", self.name
                 )
 
 
+class _Overrun(BaseException):
+    """
+    Raised in the main thread when a player call runs out of wall-clock
+    time (a BaseException, so players can't catch it by accident).
+    """
+
+
+# State of the watchdog alarm (see _WallClock)
+_ALARM = {"armed": False}
+
+
+def _on_alarm(signum, frame):
+    if _ALARM["armed"]:
+        _ALARM["armed"] = False
+        raise _Overrun()
+
+
+class _WallClock:
+    """
+    Reusable context manager for enforcing wall-clock time limits on
+    specific sections of code
+
+    * has a per-move limit and a per-game limit (on the total over all
+      sections); None or 0 for unlimited
+    * when a limit applies and the section runs in the main thread, a
+      watchdog thread interrupts it (with a signal, so that even blocking
+      calls are interrupted) as soon as it runs out of time
+    * restores the previous SIGALRM handler upon exiting the context
+    * throws an exception upon exiting the context if a limit was exceeded
+    """
+
+    def __init__(self, move_limit, game_limit, name):
+        self.name = name
+        self.move_limit = move_limit
+        self.game_limit = game_limit
+        self.clock = 0
+        self.last = 0
+        self._watchdog = None
+        self._handler = None
+
+    def budget(self):
+        """
+        Wall-clock time (seconds) the next section may take, or None if
+        unlimited.
+        """
+        limits = []
+        if self.move_limit:
+            limits.append(self.move_limit)
+        if self.game_limit:
+            limits.append(max(0, self.game_limit - self.clock))
+        return min(limits) if limits else None
+
+    def __enter__(self):
+        budget = self.budget()
+        if budget is not None and _WATCHDOG_ENABLED \
+                and threading.current_thread() is threading.main_thread():
+            # (restoring whatever handler was there before, on exit)
+            self._handler = signal.signal(signal.SIGALRM, _on_alarm)
+            _ALARM["armed"] = True
+            self._watchdog = threading.Timer(
+                budget,
+                signal.pthread_kill,
+                (threading.main_thread().ident, signal.SIGALRM),
+            )
+            self._watchdog.daemon = True
+            self._watchdog.start()
+        self.start = time.perf_counter()
+        return self  # unused
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._watchdog is not None:
+            _ALARM["armed"] = False
+            self._watchdog.cancel()
+            # (waiting for a signal that is already on its way, so it
+            # reaches our handler rather than the one being restored)
+            self._watchdog.join()
+            self._watchdog = None
+            signal.signal(signal.SIGALRM, self._handler
+                if self._handler is not None else signal.SIG_DFL)
+            self._handler = None
+        self.count(time.perf_counter() - self.start, exc_type is _Overrun)
+
+    def count(self, elapsed, overrun=False):
+        """
+        Add `elapsed` seconds to the clock, checking the time limits (which
+        were exceeded regardless, if `overrun`).
+        """
+        self.last = elapsed
+        self.clock += elapsed
+        if self.game_limit and self.clock >= self.game_limit \
+                and (overrun or self.clock > self.game_limit):
+            raise ResourceLimitException(
+                f"{self.name} exceeded available wall-clock time per game",
+                self.name,
+            )
+        if overrun or (self.move_limit and elapsed > self.move_limit):
+            raise ResourceLimitException(
+                f"{self.name} exceeded available wall-clock time per move",
+                self.name,
+            )
+
+
+# The watchdog needs to signal a specific thread (not available on windows)
+_WATCHDOG_ENABLED = hasattr(signal, "pthread_kill") \
+    and hasattr(signal, "SIGALRM")
+
+
 class _MemoryWatcher:
     """
     Context manager for clearing memory before and measuring memory usage
@@ -143,17 +589,32 @@ class _MemoryWatcher:
     * works by parsing procfs; only available on linux.
     * unless the limit is set to 0, throws an exception upon exiting the
       context if the memory limit has been breached
+    * also tracks resident memory (RSS) for telemetry: the change over the
+      last section (delta) and the peak (rss_peak)
     """
 
-    def __init__(self, space_limit):
+    def __init__(self, space_limit, name=None, shared=True):
         self.limit = space_limit
-        self._status = ""
-
-    def _set_status(self, status):
-        self._status = status
+        self.name = name
+        self.shared = shared
+        self.curr = 0
+        self.peak = 0
+        self.rss = 0
+        self.rss_peak = 0
+        self.delta = 0
+        self._checked = False
 
     def status(self):
-        return self._status
+        """
+        Space usage status message (formatted on demand).
+        """
+        if not self._checked:
+            return ""
+        return (
+            f"space: {self.curr:7.3f}MB (current usage) "
+            f"{self.peak:7.3f}MB (max usage) "
+            + ("(shared)" if self.shared else "(own)")
+        )
 
     def __enter__(self):
         return self  # unused
@@ -171,17 +632,33 @@ class _MemoryWatcher:
             curr_usage -= _DEFAULT_MEM_USAGE
             peak_usage -= _DEFAULT_MEM_USAGE
 
-            self._set_status(
-                f"space: {curr_usage:7.3f}MB (current usage) "
-                f"{peak_usage:7.3f}MB (max usage) (shared)"
-            )
+            rss_usage, rss_peak = _get_rss_usage()
+            self.check(curr_usage, peak_usage,
+                rss_usage - _DEFAULT_RSS_USAGE, rss_peak - _DEFAULT_RSS_USAGE)
 
-            # if we are limited, let's hope we are not out of space!
-            if self.limit is not None and self.limit > 0:
-                if peak_usage > self.limit:
+    def check(self, curr_usage, peak_usage, rss_usage=None, rss_peak=None):
+        """
+        Record current and peak space usage (MB), checking the space limit.
+        Current and peak resident usage default to the same figures (for
+        players measured by RSS in the first place).
+        """
+        if rss_usage is None:
+            rss_usage, rss_peak = curr_usage, peak_usage
+        self.delta = rss_usage - self.rss
+        self.rss, self.rss_peak = rss_usage, rss_peak
+        self.curr, self.peak = curr_usage, peak_usage
+        self._checked = True
+
+        # if we are limited, let's hope we are not out of space!
+        if self.limit is not None and self.limit > 0:
+            if peak_usage > self.limit:
+                if self.shared:
                     raise ResourceLimitException(
                         "players exceeded shared space limit"
                     )
+                raise ResourceLimitException(
+                    f"{self.name} exceeded available space", self.name
+                )
 
 
 def _get_space_usage():
@@ -200,7 +677,39 @@ def _get_space_usage():
     return curr_usage, peak_usage
 
 
+def _get_rss_usage():
+    """
+    Find the current and peak resident memory usage (RSS) of the current
+    process, in MB (falling back to the peak from getrusage if procfs is not
+    available)
+    """
+    try:
+        with open("/proc/self/status") as proc_status:
+            for line in proc_status:
+                if "VmRSS:" in line:
+                    curr_usage = int(line.split()[1]) / 1024  # kB -> MB
+                elif "VmHWM:" in line:
+                    peak_usage = int(line.split()[1]) / 1024  # kB -> MB
+        return curr_usage, peak_usage
+    except (OSError, UnboundLocalError):
+        if resource is None:
+            return 0, 0
+        peak_usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        return peak_usage, peak_usage
+
+
+def _cpu_time():
+    """
+    Total (user + system) CPU time used by the current process, in seconds.
+    """
+    if resource is None:
+        return time.process_time()
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
 _DEFAULT_MEM_USAGE = 0
+_DEFAULT_RSS_USAGE = 0
 
 _SPACE_ENABLED = False
 
@@ -210,10 +719,11 @@ def set_space_line():
     by default, the python interpreter uses a significant amount of space
     measure this first to later subtract from all measurements
     """
-    global _SPACE_ENABLED, _DEFAULT_MEM_USAGE
+    global _SPACE_ENABLED, _DEFAULT_MEM_USAGE, _DEFAULT_RSS_USAGE
 
     try:
         _DEFAULT_MEM_USAGE, _ = _get_space_usage()
+        _DEFAULT_RSS_USAGE, _ = _get_rss_usage()
         _SPACE_ENABLED = True
     except:
         # this also gives us a chance to detect if our space-measuring method
@@ -0,0 +1,444 @@
+"""
+A language-agnostic protocol for players served over a socket, so that a
+long-lived engine process (with warm caches, JIT state, etc.) can play
+many games without restarting, and need not be written in Python.
+
+The referee connects to the player's address (localhost TCP, given as
+'tcp://host:port', or a Unix domain socket, given as 'unix:///path') once
+per game. Messages in both directions are JSON objects, each preceded by
+its length in bytes (a 4-byte big-endian unsigned integer). The referee
+sends requests mirroring the Player interface:
+
+    {"call": "init", "args": [colour, n]}
+    {"call": "action", "args": [], "time_remaining": seconds}
+    {"call": "turn", "args": [colour, action], "time_remaining": seconds}
+    {"call": "close", "args": []}
+
+where actions are JSON arrays (e.g. ["PLACE", 2, 3] or ["STEAL"]), and
+time_remaining is the wall-clock time the player may take to reply (or
+null, if unlimited). The player answers every request except "close" with
+either
+
+    {"ok": true, "result": result}       (result is the action, or null)
+    {"ok": false, "error": message}
+
+and may also include "space": [current, peak] (its memory usage in MB),
+which is then checked against the referee's space limit. Time is measured
+by the referee (as wall-clock time per round trip). A player that runs out
+of wall-clock time is disconnected.
+
+Games played with `referee.game.play_async` talk to such players over
+asyncio streams instead (see AsyncSocketPlayerWrapper), so one event loop
+can wait on many of them at once.
+
+To serve a Python Player class this way, run:
+
+    python -m referee serve address package[:Class]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import struct
+import argparse
+import traceback
+import socketserver
+
+from referee.log import comment, StarLog
+from referee.player import PlayerWrapper, IsolatedPlayerWrapper
+from referee.player import _CountdownTimer, _MemoryWatcher, _WallClock
+from referee.player import _load_player_class, _get_rss_usage
+from referee.options import PROGRAM, package_spec
+
+# Length prefix of each message
+_LENGTH = struct.Struct(">I")
+
+# Largest message accepted (actions and replies are tiny)
+_MAX_MESSAGE = 1 << 20
+
+ADDRESS_SCHEMES = ("tcp", "unix")
+
+
+def parse_address(text):
+    """
+    Parse a player address into a (family, address) tuple suitable for
+    socket functions, or return None if text is not an address.
+    """
+    scheme, sep, rest = text.partition("://")
+    if not sep or scheme not in ADDRESS_SCHEMES:
+        return None
+    if scheme == "unix":
+        return (socket.AF_UNIX, rest)
+    host, _, port = rest.rpartition(":")
+    if not port.isdigit():
+        raise ValueError(f"expected 'tcp://host:port', got {text!r}")
+    return (socket.AF_INET, (host or "localhost", int(port)))
+
+
+def send_message(sock, message):
+    """
+    Send a message (any JSON-serialisable object) with a length prefix.
+    """
+    data = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    sock.sendall(_LENGTH.pack(len(data)) + data)
+
+
+def recv_message(sock):
+    """
+    Receive a length-prefixed message, or return None if the connection
+    was closed before one arrived.
+    """
+    header = _recv_exactly(sock, _LENGTH.size)
+    if header is None:
+        return None
+    (size,) = _LENGTH.unpack(header)
+    if size > _MAX_MESSAGE:
+        raise ValueError(f"message too long ({size} bytes)")
+    data = _recv_exactly(sock, size)
+    if data is None:
+        raise EOFError("connection closed mid-message")
+    return json.loads(data)
+
+
+def _recv_exactly(sock, size):
+    """
+    Receive exactly size bytes (or None, at end of stream).
+    """
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            if received == 0:
+                return None
+            raise EOFError("connection closed mid-message")
+        received += count
+    return buffer
+
+
+async def send_message_async(writer, message):
+    """
+    As `send_message`, for an asyncio stream writer.
+    """
+    data = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    writer.write(_LENGTH.pack(len(data)) + data)
+    await writer.drain()
+
+
+async def recv_message_async(reader):
+    """
+    As `recv_message`, for an asyncio stream reader.
+    """
+    try:
+        header = await reader.readexactly(_LENGTH.size)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise EOFError("connection closed mid-message")
+    (size,) = _LENGTH.unpack(header)
+    if size > _MAX_MESSAGE:
+        raise ValueError(f"message too long ({size} bytes)")
+    try:
+        data = await reader.readexactly(size)
+    except asyncio.IncompleteReadError:
+        raise EOFError("connection closed mid-message")
+    return json.loads(data)
+
+
+def _tuples(value):
+    """
+    Convert JSON arrays (back) into tuples, so actions arrive in the same
+    form a Python player would return them.
+    """
+    if isinstance(value, list):
+        return tuple(_tuples(item) for item in value)
+    return value
+
+
+# # #
+# Referee side
+#
+
+class SocketPlayerWrapper(PlayerWrapper):
+    """
+    Variant of PlayerWrapper for a player served at a socket address (see
+    module docstring). Time is measured as wall-clock time per round trip
+    (the only time the referee can observe), and space as reported by the
+    player, if it reports it.
+    """
+
+    def __init__(self, name, player_loc, time_limit=None, space_limit=None,
+            gc_policy="always", move_time=None, wall_time=None,
+            telemetry=None):
+        self.name = name
+        self.label = name
+        self.telemetry = telemetry
+
+        # no garbage of this player's lives in the referee, so gc_policy is
+        # unused (as for isolated players)
+        self.timer = _CountdownTimer(time_limit, self.name, None)
+        self.space = _MemoryWatcher(space_limit, self.name, shared=False)
+        self.wall = _WallClock(move_time, wall_time, self.name)
+
+        address, _ = player_loc
+        self.location = address
+        self.Player = repr(address)  # (for display)
+        self._family, self._sockaddr = parse_address(address)
+        self._connect()
+
+    def _connect(self):
+        comment(f"connecting to {self.name} at '{self.location}'")
+        self._sock = socket.socket(self._family, socket.SOCK_STREAM)
+        self._sock.connect(self._sockaddr)
+        if self._family == socket.AF_INET:
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def close(self):
+        """
+        Tell the player the game is over, and disconnect.
+        """
+        try:
+            send_message(self._sock, {"call": "close", "args": []})
+        except OSError:
+            pass
+        self._sock.close()
+
+    def _message(self, method, args, budget):
+        """
+        Request message for a call.
+        """
+        message = {"call": method, "args": list(args)}
+        if method != "init":
+            message["time_remaining"] = budget
+        return message
+
+    def _invoke(self, method, *args):
+        """
+        Send a call to the player and wait for its reply, accounting for
+        the (wall-clock) time taken and any space usage it reports.
+        """
+        budget = self.wall.budget()
+        message = self._message(method, args, budget)
+        start = time.perf_counter()
+        try:
+            self._sock.settimeout(budget)
+            send_message(self._sock, message)
+            reply = recv_message(self._sock)
+        except socket.timeout:
+            self._sock.close()
+            self.wall.count(time.perf_counter() - start, overrun=True)
+        except (OSError, EOFError, ValueError) as e:
+            raise RuntimeError(f"{self.name}'s connection failed: {e}")
+        return self._accept(reply, time.perf_counter() - start)
+
+    def _accept(self, reply, elapsed):
+        """
+        Account for a call that took elapsed (wall-clock) seconds, and
+        return its result from the player's reply.
+        """
+        self.wall.count(elapsed)
+        if reply is None:
+            raise RuntimeError(f"{self.name} closed the connection")
+        if not reply.get("ok"):
+            raise RuntimeError(
+                f"{self.name} reported an error:\n{reply.get('error')}"
+            )
+        self.timer.count(elapsed)
+        if "space" in reply:
+            self.space.check(*reply["space"])
+        return _tuples(reply.get("result"))
+
+
+class AsyncSocketPlayerWrapper(SocketPlayerWrapper):
+    """
+    Variant of SocketPlayerWrapper for `referee.game.play_async`, talking to
+    the player over asyncio streams so that waiting for it doesn't block
+    the event loop. It connects when the player is initialised, and only
+    its coroutine methods (`init_async` etc.) can be used.
+    """
+
+    def _connect(self):
+        self._reader = self._writer = None
+
+    def close(self):
+        """
+        Disconnect (the player sees the connection close, which it treats
+        like a "close" request).
+        """
+        if self._writer is not None:
+            self._writer.close()
+
+    def _invoke(self, method, *args):
+        raise TypeError(
+            f"{type(self).__name__} only supports play_async"
+        )
+
+    async def _invoke_async(self, method, *args):
+        """
+        Send a call to the player and await its reply (connecting first,
+        off the clock, if need be), accounting as for `_invoke`. If the call
+        runs out of wall-clock time, the player is disconnected.
+        """
+        if self._writer is None:
+            comment(f"connecting to {self.name} at '{self.location}'")
+            if self._family == socket.AF_UNIX:
+                self._reader, self._writer = \
+                    await asyncio.open_unix_connection(self._sockaddr)
+            else:
+                self._reader, self._writer = \
+                    await asyncio.open_connection(*self._sockaddr)
+                self._writer.get_extra_info("socket").setsockopt(
+                    socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        budget = self.wall.budget()
+        message = self._message(method, args, budget)
+        start = time.perf_counter()
+        try:
+            reply = await asyncio.wait_for(self._round_trip(message), budget)
+        except asyncio.TimeoutError:
+            self._writer.close()
+            self.wall.count(time.perf_counter() - start, overrun=True)
+        except (OSError, EOFError, ValueError) as e:
+            raise RuntimeError(f"{self.name}'s connection failed: {e}")
+        return self._accept(reply, time.perf_counter() - start)
+
+    async def _round_trip(self, message):
+        await send_message_async(self._writer, message)
+        return await recv_message_async(self._reader)
+
+
+def player_wrapper_class(player_loc, isolate=False, asynchronous=False):
+    """
+    The wrapper class to use for a player location (as returned by
+    referee.options.package_spec), in games played by `referee.game.play`
+    or (if asynchronous) `referee.game.play_async`.
+    """
+    if parse_address(player_loc[0]) is not None:
+        if asynchronous:
+            return AsyncSocketPlayerWrapper
+        return SocketPlayerWrapper
+    return IsolatedPlayerWrapper if isolate else PlayerWrapper
+
+
+# # #
+# Player side
+#
+
+class _PlayerHandler(socketserver.BaseRequestHandler):
+    """
+    Serve one game (connection) for the server's Player class.
+    """
+
+    def setup(self):
+        if self.request.family != socket.AF_UNIX:
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self):
+        player = None
+        while True:
+            message = recv_message(self.request)
+            if message is None or message["call"] == "close":
+                break
+            method, args = message["call"], _tuples(message["args"])
+            try:
+                if method == "init":
+                    player = self.server.Player(*args)
+                    result = None
+                elif method in ("action", "turn"):
+                    player.time_remaining = message.get("time_remaining")
+                    result = getattr(player, method)(*args)
+                else:
+                    raise ValueError(f"unknown call {method!r}")
+            except Exception:
+                reply = {"ok": False, "error": traceback.format_exc()}
+            else:
+                curr_usage, peak_usage = _get_rss_usage()
+                reply = {
+                    "ok": True,
+                    "result": result,
+                    "space": [curr_usage - self.server.base_usage,
+                        peak_usage - self.server.base_usage],
+                }
+            send_message(self.request, reply)
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+else:  # (not available on windows)
+    _UnixServer = None
+
+
+def _stale_socket(path):
+    """
+    True iff a Unix domain socket file exists at path, but nothing is
+    listening on it.
+    """
+    if not os.path.exists(path):
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            return True
+        except OSError:
+            return False
+    return False
+
+
+def serve(player_loc, address):
+    """
+    Serve a Player class at an address until interrupted, playing any
+    number of games (concurrently, one thread per connection). The class
+    is imported once, up front.
+    """
+    family, sockaddr = parse_address(address)
+    server_cls = _TCPServer if family == socket.AF_INET else _UnixServer
+    Player = _load_player_class(*player_loc)
+    base_usage, _ = _get_rss_usage()
+    if family == socket.AF_UNIX and _stale_socket(sockaddr):
+        os.unlink(sockaddr)  # (left behind by a server that was killed)
+    with server_cls(sockaddr, _PlayerHandler) as server:
+        server.Player = Player
+        server.base_usage = base_usage
+        try:
+            server.serve_forever()
+        finally:
+            if family == socket.AF_UNIX:
+                os.unlink(sockaddr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog=f"{PROGRAM} serve",
+        description="serve a Player class over a socket, for use by "
+        "referees given its address as a player location.",
+    )
+    parser.add_argument(
+        "address",
+        help="address to listen on ('tcp://host:port' or 'unix:///path')",
+    )
+    parser.add_argument(
+        "player",
+        type=package_spec,
+        help="location of the Player class (e.g. package name)",
+    )
+    options = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    if parse_address(options.address) is None:
+        parser.error(f"not an address: {options.address!r}")
+
+    log = StarLog(level=1)
+    log.comment(f"serving {options.player[0]}:{options.player[1]} at "
+        f"{options.address} (press ctrl+c to stop)")
+    try:
+        serve(options.player, options.address)
+    except KeyboardInterrupt:
+        log.comment("bye!")
@@ -0,0 +1,149 @@
+"""
+Read and write compact binary game records, as an alternative to the
+referee's text log that is quick to write, and quick to load back for
+analysis (see `referee.replay`).
+
+A record is a fixed-size header followed by one little-endian int16 per
+move (turn order, red first):
+
+    offset  size  field
+    0       4     magic bytes b"CXGR"
+    4       1     format version (1)
+    5       1     board size n
+    6       1     result code (see RESULT_CODES)
+    7       1     (reserved)
+    8       4     number of moves (uint32)
+    12      32    red player name (utf-8, zero padded, truncated to fit)
+    44      32    blue player name (utf-8, zero padded, truncated to fit)
+    76      4     (reserved)
+    80      2 * number of moves
+
+A PLACE action in cell (r, q) is stored as r * n + q, and a STEAL action
+is stored as -1.
+"""
+
+import sys
+import mmap
+import struct
+from array import array
+
+MAGIC = b"CXGR"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBxI32s32s4x")
+
+STEAL_MOVE = -1
+
+# Space for each player name in the header (bytes)
+NAME_SIZE = 32
+
+# Result codes (an aborted game ended with an error, such as an illegal
+# action or exceeded resource limit, before the next move was recorded)
+RESULT_CODES = {
+    None: 0,
+    "winner: red": 1,
+    "winner: blue": 2,
+    "draw": 3,
+    "error": 4,
+}
+
+
+def result_code(result):
+    """
+    Result code for a game result string (as returned by Game.end).
+    """
+    if result is not None and result.startswith("draw"):
+        return RESULT_CODES["draw"]
+    return RESULT_CODES[result]
+
+
+def encode_action(action, n):
+    """
+    Encode a (sanitised) action as a single move value.
+    """
+    atype, *aargs = action
+    if atype == "STEAL":
+        return STEAL_MOVE
+    r, q = aargs
+    return r * n + q
+
+
+def decode_move(move, n):
+    """
+    Decode a single move value back into an action tuple.
+    """
+    if move == STEAL_MOVE:
+        return ("STEAL",)
+    r, q = divmod(int(move), n)
+    return ("PLACE", r, q)
+
+
+def write_record(path, n, players, result, moves):
+    """
+    Write a game record to path. `players` are the names of the red and
+    blue players, `result` is a result code and `moves` a sequence of move
+    values.
+    """
+    moves = array("h", moves)
+    if sys.byteorder == "big":
+        moves.byteswap()
+    red, blue = (_encode_name(name) for name in players)
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(
+            MAGIC, VERSION, n, result, len(moves), red, blue
+        ))
+        file.write(moves.tobytes())
+
+
+def _encode_name(name):
+    """
+    Encode a player name for the header, truncating it (if need be) to fit
+    without splitting a multi-byte character.
+    """
+    data = name.encode("utf-8")[:NAME_SIZE]
+    return data.decode("utf-8", errors="ignore").encode("utf-8")
+
+
+class Record:
+    """
+    A game record loaded from a buffer (e.g., a memory-mapped file), with
+    fields n, players, result, and moves (an int16 memoryview into the
+    buffer, so moves are not copied).
+    """
+
+    def __init__(self, buffer):
+        if len(buffer) < HEADER.size:
+            raise ValueError("truncated game record (incomplete header)")
+        magic, version, n, result, nmoves, red, blue = \
+            HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a (supported) Cachex game record")
+        self.n = n
+        self.result = result
+        self.players = tuple(name.rstrip(b"\0").decode("utf-8")
+            for name in (red, blue))
+        end = HEADER.size + 2 * nmoves
+        if len(buffer) < end:
+            raise ValueError(
+                f"truncated game record ({nmoves} moves expected, only "
+                f"{len(buffer) - HEADER.size} bytes of moves found)"
+            )
+        self.moves = memoryview(buffer)[HEADER.size:end].cast("h")
+        if sys.byteorder == "big":
+            self.moves = array("h", self.moves)
+            self.moves.byteswap()
+
+    def actions(self):
+        """
+        Generate the recorded actions (as action tuples).
+        """
+        for move in self.moves:
+            yield decode_move(move, self.n)
+
+
+def load_record(path):
+    """
+    Memory-map a game record file and return it as a Record.
+    """
+    with open(path, "rb") as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return Record(buffer)
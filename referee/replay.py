@@ -0,0 +1,141 @@
+"""
+Replay binary game records (see `referee.record`) through the referee's
+game rules, checking that every recorded game is legal and ends with its
+recorded result. Run with:
+
+    python -m referee replay [options] path [path ...]
+
+where each path is a record file or a directory of them (*.cxr). Records
+are memory-mapped, and re-simulated across a pool of worker processes.
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from referee.game import Game, IllegalActionException, BOARD_TYPES
+from referee.game import _PLAYER_TURN_ORDER
+from referee.log import StarLog
+from referee.record import load_record, result_code, RESULT_CODES
+from referee.options import PROGRAM, BOARD_DEFAULT
+
+
+def get_options(argv):
+    """Parse and return replay command-line arguments."""
+    parser = argparse.ArgumentParser(
+        prog=f"{PROGRAM} replay",
+        description="re-simulate binary Cachex game records and verify "
+        "their results.",
+    )
+    parser.add_argument(
+        "paths",
+        metavar="path",
+        nargs="+",
+        help="game record file, or directory of *.cxr record files",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="number of worker processes (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-b",
+        "--board",
+        choices=BOARD_TYPES,
+        default=BOARD_DEFAULT,
+        help="board representation used to re-simulate games "
+        "(default: %(default)s).",
+    )
+    return parser.parse_args(argv)
+
+
+def replay(path, board_cls=BOARD_TYPES[BOARD_DEFAULT]):
+    """
+    Re-simulate a single game record. Returns None if the replayed game
+    matches its recorded result, otherwise a message describing why not.
+    """
+    record = load_record(path)
+    game = Game(record.n, board_cls=board_cls)
+    try:
+        for i, action in enumerate(record.actions()):
+            if game.over():
+                return f"game ended after {i} of {len(record.moves)} moves"
+            game.update(_PLAYER_TURN_ORDER[i % 2], action)
+    except IllegalActionException as e:
+        return f"illegal action on move {i + 1}: {e}"
+
+    if game.over():
+        code = result_code(game.result)
+    else:
+        # An unfinished game must have been aborted (with an error)
+        code = RESULT_CODES["error"]
+    if code != record.result:
+        return f"recorded result {record.result}, replayed result {code}"
+    return None
+
+
+def _replay_chunk(paths, board):
+    """
+    Replay a list of records in a worker process, returning a list of
+    (path, message) pairs for records that failed verification.
+    """
+    failures = []
+    for path in paths:
+        try:
+            message = replay(path, BOARD_TYPES[board])
+        except (OSError, ValueError) as e:
+            message = f"unreadable record: {e}"
+        if message is not None:
+            failures.append((path, message))
+    return failures
+
+
+def _expand(paths):
+    """
+    List record files given as files or directories.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.cxr"))))
+        else:
+            files.append(path)
+    return files
+
+
+def main(argv=None):
+    options = get_options(sys.argv[1:] if argv is None else argv)
+    log = StarLog(level=0)
+    paths = _expand(options.paths)
+
+    # Replay in chunks, so each task amortises its inter-process overhead
+    jobs = max(1, min(options.jobs, len(paths)))
+    chunk = max(1, min(256, len(paths) // (jobs * 4) or 1))
+    chunks = [paths[i:i + chunk] for i in range(0, len(paths), chunk)]
+
+    start = time.perf_counter()
+    failures = []
+    if jobs > 1:
+        with ProcessPoolExecutor(jobs) as pool:
+            for result in pool.map(_replay_chunk, chunks,
+                    [options.board] * len(chunks)):
+                failures.extend(result)
+    else:
+        for paths_chunk in chunks:
+            failures.extend(_replay_chunk(paths_chunk, options.board))
+    elapsed = time.perf_counter() - start
+
+    for path, message in failures:
+        log.print(f"{path}: {message}")
+    log.print(
+        f"replayed {len(paths)} games in {elapsed:.3f}s "
+        f"({len(paths) / max(elapsed, 1e-9):.1f} games/s): "
+        f"{len(paths) - len(failures)} ok, {len(failures)} failed"
+    )
+    if failures:
+        sys.exit(1)
@@ -0,0 +1,115 @@
+"""
+Map Cachex positions onto a canonical representative of their symmetry
+class, so that tables keyed by position (transposition tables, opening
+books, replay buffers) can share entries between symmetric positions.
+
+A position is a board of internal token types (0: empty, 1: red, 2: blue)
+with shape (n, n), or a batch of them with shape (..., n, n). Two
+transforms preserve the game:
+
+* ROTATE turns the board through 180 degrees. Each player keeps their
+  colour (and their pair of edges, which trade places).
+* SWAP mirrors the board along the major axis and swaps token colours, as
+  for STEAL (see Board.swap). The player to move changes colour.
+
+These commute, and each is its own inverse, so with their combination
+(SWAP_ROTATE) and IDENTITY they form a group of four transforms. A
+transform is stored as a small integer (a bitwise OR of ROTATE and SWAP),
+and the transform taking a position to its canonical form also takes
+actions in the canonical position back to the original one.
+"""
+
+from numpy import asarray, where, full, broadcast_to, int8
+from numpy import take_along_axis
+
+from referee.board import swap_many
+
+IDENTITY = 0
+ROTATE = 1
+SWAP = 2
+SWAP_ROTATE = ROTATE | SWAP
+
+TRANSFORMS = (IDENTITY, ROTATE, SWAP, SWAP_ROTATE)
+
+
+def apply(boards, transforms):
+    """
+    Apply a transform (or an array of transforms, one per board in a
+    batch) to a board or batch of boards, returning a new array.
+    """
+    boards = asarray(boards)
+    transforms = asarray(transforms)
+    rotate = (transforms & ROTATE).astype(bool)[..., None, None]
+    swap = (transforms & SWAP).astype(bool)[..., None, None]
+    boards = where(rotate, boards[..., ::-1, ::-1], boards)
+    return where(swap, swap_many(boards), boards)
+
+
+def _before(a, b):
+    """
+    True for each pair of boards (in two equal-shape batches) where a sorts
+    strictly before b, comparing their cells in row-major order.
+    """
+    a = a.reshape(*a.shape[:-2], -1)
+    b = b.reshape(*b.shape[:-2], -1)
+    differ = a != b
+    first = differ.argmax(axis=-1)[..., None]
+    return differ.any(axis=-1) & (take_along_axis(a, first, -1)[..., 0]
+        < take_along_axis(b, first, -1)[..., 0])
+
+
+def canonical(boards, player=None):
+    """
+    Canonical form of a board or batch of boards, returned along with the
+    transform (or array of transforms) that produces it.
+
+    If player (the colour to move, or an array of colours, one per board)
+    is given, the canonical form has red to move: only transforms that
+    leave it with red to move are considered. Otherwise, all transforms
+    are. Among those, the canonical form is the first image in row-major
+    order of cells (ties going to the first transform in TRANSFORMS).
+    """
+    boards = asarray(boards)
+    shape = boards.shape[:-2]
+    if player is None:
+        candidates = TRANSFORMS
+        base = full(shape, IDENTITY, dtype=int8)
+    else:
+        # (blue to move needs a SWAP, red to move must not have one)
+        candidates = (IDENTITY, ROTATE)
+        base = where(asarray(player) == "blue", SWAP, IDENTITY)
+        base = broadcast_to(base, shape).astype(int8)
+    best_transforms = base | candidates[0]
+    best = apply(boards, best_transforms)
+    for transform in candidates[1:]:
+        transforms = base | transform
+        image = apply(boards, transforms)
+        better = _before(image, best)
+        best = where(better[..., None, None], image, best)
+        best_transforms = where(better, transforms, best_transforms)
+    return best, best_transforms.astype(int8)
+
+
+def transform_player(player, transform):
+    """
+    The colour a player plays as after a transform.
+    """
+    if transform & SWAP:
+        return "blue" if player == "red" else "red"
+    return player
+
+
+def transform_action(action, transform, n):
+    """
+    Apply a transform to an action (e.g., to map a move chosen for a
+    canonical position back onto the original position).
+    """
+    atype, *aargs = action
+    if atype != "PLACE":
+        return action
+    r, q = aargs
+    if transform & ROTATE:
+        r, q = n - 1 - r, n - 1 - q
+    if transform & SWAP:
+        r, q = q, r
+    return (atype, r, q)
@@ -0,0 +1,408 @@
+"""
+Solve small Cachex boards (n <= 4) outright, by retrograde analysis, and
+store the solution as a table that players can memory-map and probe in
+O(1) during play. Build a table with:
+
+    python -m referee tablebase n path
+
+Positions are keyed by their canonical form: the board as seen by the
+player to move, mirrored along the major board axis (with colours swapped,
+as for STEAL) whenever blue is to move, so that it is always "red" to move.
+A canonical position is then a base-3 number, with digit r * n + q being
+0 for an empty cell, 1 for a token of the player to move and 2 for a token
+of their opponent. This is a perfect hash, so the table needs no keys: it
+is an array of values indexed by canonical position, followed by one entry
+for the first turn of the game (the empty board, where the centre cell is
+off limits) and one per possible first move (where STEAL is on offer).
+
+A table file is a fixed-size header followed by one little-endian int16
+value per entry:
+
+    offset  size  field
+    0       4     magic bytes b"CXTB"
+    4       1     format version (1)
+    5       1     board size n
+    6       2     (reserved)
+    8       4     number of entries (uint32, 3 ** (n * n) + n * n + 1)
+    12      2 * number of entries
+
+A value of 0 means neither player can force a win from the position (with
+perfect play, the game goes on until a draw rule applies). Otherwise, its
+sign is positive if the player to move can force a win, and negative if
+their opponent can, and its magnitude is one more than the number of
+turns remaining, with perfect play (winning as quickly, or losing as
+slowly, as possible). The referee's repetition and turn limit draw rules
+are not modelled.
+"""
+
+import sys
+import mmap
+import time
+import struct
+import argparse
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from referee.bitboard import _tables
+from referee.board import _HEX_STEPS
+from referee.log import StarLog
+
+MAGIC = b"CXTB"
+VERSION = 1
+HEADER = struct.Struct("<4sBB2xI")
+
+# Largest board size that can be solved (3 ** 25 positions is too many)
+MAX_N = 4
+
+# Number of positions examined at once (bounds the solver's memory use)
+_CHUNK = 1 << 20
+
+# A probed position: result is 1 if the player to move can force a win, -1
+# if their opponent can, otherwise 0, and turns is the number of turns left
+# with perfect play (0 for a draw)
+Solution = namedtuple("Solution", "result turns")
+
+
+@lru_cache(maxsize=None)
+def _rules(n):
+    """
+    Pre-compute (and cache per board size) the tables used to generate
+    moves on canonical positions, with cells as bits r * n + q of a pair of
+    bitboards (one for the player to move, one for their opponent).
+
+    * captures[i] is a list of (opposite bit, mid cells mask) pairs for the
+      diamond captures made by placing a token in cell i.
+    * transpose[i] is the index of cell i mirrored along the major axis.
+    * encode[k] maps byte k of a bitboard to the sum of 3 ** j over the
+      cells j its set bits become once mirrored, so the canonical position
+      reached by a move can be assembled from a few lookups.
+    * shifts is a list of (source mask, shift) pairs, one per hex step,
+      for growing a set of cells by its neighbours.
+    """
+    _, captures, transpose = _tables(n)
+    cells = n * n
+    nbytes = (cells + 7) // 8
+    encode = np.zeros((nbytes, 256), dtype=np.int64)
+    for k in range(nbytes):
+        for byte in range(256):
+            for j in range(8):
+                if byte >> j & 1 and 8 * k + j < cells:
+                    encode[k, byte] += 3 ** transpose[8 * k + j]
+    shifts = []
+    for dr, dq in _HEX_STEPS.tolist():
+        source = 0
+        for r in range(n):
+            for q in range(n):
+                if 0 <= r + dr < n and 0 <= q + dq < n:
+                    source |= 1 << (r * n + q)
+        shifts.append((source, dr * n + dq))
+    return captures, transpose, encode, shifts
+
+
+def _edges(n):
+    """
+    Bitboard masks of the first and last column of cells (the edges the
+    opponent of the player to move is trying to connect).
+    """
+    first = sum(1 << (r * n) for r in range(n))
+    return first, first << (n - 1)
+
+
+def _decode(codes, n):
+    """
+    Split an array of canonical positions into bitboards (for the player to
+    move, and for their opponent).
+    """
+    codes = codes.astype(np.int64)
+    mover = np.zeros_like(codes)
+    other = np.zeros_like(codes)
+    for i in range(n * n):
+        digit = codes % 3
+        codes //= 3
+        mover |= (digit == 1).astype(np.int64) << i
+        other |= (digit == 2).astype(np.int64) << i
+    return mover, other
+
+
+def _place(mover, other, i, n):
+    """
+    Place a token of the player to move in cell i (which must be empty),
+    applying any captures. Works on integer bitboards or arrays of them.
+    Returns the new canonical position, from the opponent's point of view.
+    """
+    captures, _, encode, _ = _rules(n)
+    mover = mover | (1 << i)
+    captured = 0
+    for opposite, mid in captures[i]:
+        captured = captured | mid * (
+            ((mover & opposite) != 0) & ((other & mid) == mid))
+    other = other & ~captured
+    code = 0
+    for k in range(len(encode)):
+        code = code + encode[k][(other >> (8 * k)) & 255] \
+            + 2 * encode[k][(mover >> (8 * k)) & 255]
+    return code
+
+
+def _connected(bits, n):
+    """
+    Boolean array marking the bitboards (in an array) that connect the
+    first and last column of cells, as the opponent of the player to move
+    is trying to do.
+    """
+    _, _, _, shifts = _rules(n)
+    first, last = _edges(n)
+    reach = bits & first
+    while True:
+        grown = reach
+        for source, shift in shifts:
+            if shift > 0:
+                grown = grown | (reach & source) << shift
+            else:
+                grown = grown | (reach & source) >> -shift
+        grown &= bits
+        if np.array_equal(grown, reach):
+            return (reach & last) != 0
+        reach = grown
+
+
+def _preference(values):
+    """
+    Rank moves (lowest first) by the values of the positions they lead to
+    (each from the opponent's point of view): the quickest win first, then
+    draws, then the slowest loss.
+    """
+    values = values.astype(np.int64)
+    return np.where(values < 0, -values,
+        np.where(values == 0, 1 << 16, (1 << 17) - values))
+
+
+def _back_up(values):
+    """
+    The value of a position, given the values of the positions its moves
+    lead to (each from the opponent's point of view).
+    """
+    losses = values[values < 0]
+    if losses.size:
+        return 1 - int(losses.max())
+    if values.size == 0 or (values == 0).any():
+        return 0
+    return -1 - int(values.max())
+
+
+def solve(n, log=None):
+    """
+    Solve all positions on a board of size n, returning the table's values
+    (see module docstring) as an int16 array. Progress is reported through
+    a StarLog, if given.
+
+    Every position is a loss in 0 turns if the opponent of the player to
+    move has a winning path. Then, turn by turn, each unsolved position
+    whose moves lead to a position lost in k turns is a win in k + 1, and
+    each position whose moves all lead to positions won in at most k turns
+    is a loss in k + 1. Positions still unsolved once a turn passes without
+    progress are draws.
+    """
+    if not 2 <= n <= MAX_N:
+        raise ValueError(f"can only solve boards of size 2 to {MAX_N}")
+    cells = n * n
+    size = 3 ** cells
+    values = np.zeros(size + cells + 1, dtype=np.int16)
+
+    # Positions where the game is already over
+    for start in range(0, size, _CHUNK):
+        codes = np.arange(start, min(start + _CHUNK, size))
+        _, other = _decode(codes, n)
+        values[codes[_connected(other, n)]] = -1
+    unsolved = np.flatnonzero(values[:size] == 0).astype(np.int32)
+    if log is not None:
+        log.comment(f"{size - unsolved.size} positions are over")
+
+    turns = 0
+    while unsolved.size:
+        turns += 1
+        found = []
+        for start in range(0, unsolved.size, _CHUNK):
+            codes = unsolved[start:start + _CHUNK]
+            mover, other = _decode(codes, n)
+            empty = ~(mover | other)
+            fastest = np.full(codes.size, np.iinfo(np.int16).min, np.int64)
+            slowest = np.zeros(codes.size, dtype=np.int64)
+            escape = np.zeros(codes.size, dtype=bool)
+            moves = np.zeros(codes.size, dtype=bool)
+            for i in range(cells):
+                legal = np.flatnonzero(empty >> i & 1)
+                child = values[_place(mover[legal], other[legal], i, n)]
+                child = child.astype(np.int64)
+                fastest[legal] = np.maximum(fastest[legal],
+                    np.where(child < 0, child, fastest[legal]))
+                slowest[legal] = np.maximum(slowest[legal], child)
+                escape[legal] |= child == 0
+                moves[legal] = True
+            won = fastest > np.iinfo(np.int16).min
+            value = np.where(won, 1 - fastest, -1 - slowest)
+            done = won | (moves & ~escape)
+            found.append((codes[done], value[done]))
+        # (only apply the results after the turn, so each position is
+        # solved with the shortest win or longest loss available)
+        for codes, value in found:
+            values[codes] = value
+        remaining = unsolved[values[unsolved] == 0]
+        if log is not None:
+            log.comment(f"turn {turns}: solved "
+                f"{unsolved.size - remaining.size} positions "
+                f"({remaining.size} left)")
+        if remaining.size == unsolved.size:
+            break
+        unsolved = remaining
+
+    # The opening: first, positions where STEAL is on offer (one for each
+    # of red's first moves), then the empty board
+    for i in range(cells):
+        steal = values[2 * 3 ** _rules(n)[1][i]]
+        places = [values[3 ** i + 2 * 3 ** j] for j in range(cells) if j != i]
+        values[size + 1 + i] = _back_up(np.array([steal] + places))
+    first = [values[size + 1 + i] for i in range(cells)
+        if not (n % 2 == 1 and i == cells // 2)]
+    values[size] = _back_up(np.array(first))
+    return values
+
+
+def write_tablebase(path, n, values):
+    """
+    Write a table's values (as returned by `solve`) to path.
+    """
+    values = values.astype("<i2", copy=False)
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, n, values.size))
+        file.write(values.tobytes())
+
+
+class Tablebase:
+    """
+    A solved-position table loaded from a buffer (e.g., a memory-mapped
+    file), with fields n and values (an int16 array over the buffer, so
+    values are not copied). Positions are given as a board (any class with
+    the Board API, such as referee.board.Board) along with the colour of
+    the player to move and the number of turns played so far.
+    """
+
+    def __init__(self, buffer):
+        magic, version, n, count = HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a (supported) Cachex tablebase")
+        if count != 3 ** (n * n) + n * n + 1:
+            raise ValueError("tablebase is truncated")
+        self.n = n
+        self.values = np.frombuffer(buffer, dtype="<i2", count=count,
+            offset=HEADER.size)
+        self._powers = [3 ** i for i in range(n * n)]
+        self._transpose = _rules(n)[1]
+
+    def key(self, board, player, nturns):
+        """
+        Index of a position in the table (its canonical form).
+        """
+        cells = self.n * self.n
+        tokens = board.token_types()
+        if nturns == 0:
+            return 3 ** cells
+        if nturns == 1:
+            return 3 ** cells + 1 + tokens.index(1)
+        code = 0
+        if player == "red":
+            for i, token in enumerate(tokens):
+                if token:
+                    code += token * self._powers[i]
+        else:
+            for i, token in enumerate(tokens):
+                if token:
+                    code += (3 - token) * self._powers[self._transpose[i]]
+        return code
+
+    def probe(self, board, player, nturns):
+        """
+        Look up the solution of a position (as a Solution).
+        """
+        value = int(self.values[self.key(board, player, nturns)])
+        if value == 0:
+            return Solution(0, 0)
+        return Solution(1 if value > 0 else -1, abs(value) - 1)
+
+    def best_action(self, board, player, nturns):
+        """
+        An action for the player to move that wins as quickly as possible,
+        or failing that draws, or failing that loses as slowly as possible.
+        """
+        n, cells = self.n, self.n * self.n
+        tokens = board.token_types()
+        actions, keys = [], []
+        if nturns == 1:
+            actions.append(("STEAL",))
+            keys.append(2 * 3 ** self._transpose[tokens.index(1)])
+        if nturns <= 1:
+            for i in range(cells):
+                if tokens[i] or (n % 2 == 1 and nturns == 0
+                        and i == cells // 2):
+                    continue
+                actions.append(("PLACE", *divmod(i, n)))
+                if nturns == 0:
+                    keys.append(3 ** cells + 1 + i)
+                else:
+                    keys.append(3 ** tokens.index(1) + 2 * 3 ** i)
+        else:
+            # Moves are generated on the canonical position, so (if blue
+            # is to move) cells need mirroring back
+            mirror = self._transpose if player == "blue" else range(cells)
+            mover = other = 0
+            for i, token in enumerate(tokens):
+                if token == (1 if player == "red" else 2):
+                    mover |= 1 << mirror[i]
+                elif token:
+                    other |= 1 << mirror[i]
+            for i in range(cells):
+                if not (mover | other) >> i & 1:
+                    actions.append(("PLACE", *divmod(mirror[i], n)))
+                    keys.append(int(_place(mover, other, i, n)))
+        ranks = _preference(self.values[keys])
+        return actions[int(np.argmin(ranks))]
+
+
+def load_tablebase(path):
+    """
+    Memory-map a tablebase file and return it as a Tablebase.
+    """
+    with open(path, "rb") as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return Tablebase(buffer)
+
+
+def main(argv=None):
+    # (imported here, as referee.options depends on the player modules)
+    from referee.options import PROGRAM
+
+    parser = argparse.ArgumentParser(
+        prog=f"{PROGRAM} tablebase",
+        description="solve a small Cachex board, writing a table of "
+        "solved positions for players to probe during play.",
+    )
+    parser.add_argument("n", type=int, help=f"board size (2 to {MAX_N})")
+    parser.add_argument("path", help="file to write the table to")
+    options = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    if not 2 <= options.n <= MAX_N:
+        parser.error(f"board size must be between 2 and {MAX_N}")
+
+    log = StarLog(level=1)
+    start = time.perf_counter()
+    values = solve(options.n, log)
+    write_tablebase(options.path, options.n, values)
+    log.comment(f"solved n = {options.n} in "
+        f"{time.perf_counter() - start:.1f}s, wrote {options.path}")
+    result = values[3 ** (options.n * options.n)]
+    if result == 0:
+        log.print("with perfect play, the game is a draw")
+    else:
+        log.print(f"with perfect play, {'red' if result > 0 else 'blue'} "
+            f"wins in {abs(int(result)) - 1} turns")
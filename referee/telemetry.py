@@ -0,0 +1,183 @@
+"""
+Structured, per-call metrics for players (as measured by the player
+wrappers), written to a pluggable sink: a CSV or JSONL file, or an
+in-memory ring buffer. Files of metrics (e.g. from a tournament) can be
+summarised with:
+
+    python -m referee telemetry file [file ...]
+
+which reports p50/p95/p99 move latency (wall-clock time per action) for
+each player.
+"""
+
+import sys
+import csv
+import json
+import math
+import argparse
+from collections import namedtuple, deque, defaultdict
+
+from referee.log import StarLog
+
+# Metrics for a single player call:
+# * player      -- name of the player (wrapper)
+# * colour      -- colour the player is playing
+# * call        -- the method called ("init", "action" or "turn")
+# * cpu         -- CPU time taken by the call (seconds)
+# * wall        -- wall-clock time taken by the call (seconds)
+# * gc          -- wall-clock time spent collecting garbage before the call
+# * space_delta -- change in resident memory usage (RSS) over the call (MB)
+# * space_peak  -- peak resident memory usage after the call (MB)
+# * action      -- the action returned (for "action" calls) or received (for
+#                  "turn" calls), otherwise None
+# * outcome     -- how the call ended: "ok", "limit" (it exceeded a resource
+#                  limit, e.g. it ran out of time) or "error"
+CallMetrics = namedtuple(
+    "CallMetrics",
+    "player colour call cpu wall gc space_delta space_peak action outcome",
+    defaults=("ok",),
+)
+
+
+class RingBuffer:
+    """
+    Sink keeping the most recent metrics in memory (all of them, if size
+    is None).
+    """
+
+    def __init__(self, size=None):
+        self.records = deque(maxlen=size)
+
+    def write(self, metrics):
+        self.records.append(metrics)
+
+    def close(self):
+        pass
+
+    def __iter__(self):
+        return iter(self.records)
+
+
+class JSONLSink:
+    """
+    Sink writing metrics to a file, one JSON object per line.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "w")
+
+    def write(self, metrics):
+        self.file.write(json.dumps(metrics._asdict()) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class CSVSink:
+    """
+    Sink writing metrics to a CSV file (with a header row).
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(CallMetrics._fields)
+
+    def write(self, metrics):
+        self.writer.writerow(metrics)
+
+    def close(self):
+        self.file.close()
+
+
+def open_sink(path):
+    """
+    Open a file sink for path, in CSV format if its name ends in ".csv",
+    otherwise in JSONL format.
+    """
+    if path.endswith(".csv"):
+        return CSVSink(path)
+    return JSONLSink(path)
+
+
+def load(path):
+    """
+    Load metrics written by a file sink (as a list of CallMetrics).
+    """
+    with open(path, newline="") as file:
+        if path.endswith(".csv"):
+            rows = list(csv.DictReader(file))
+            for row in rows:
+                for field in ("cpu", "wall", "gc", "space_delta",
+                        "space_peak"):
+                    row[field] = float(row[field])
+        else:
+            rows = [json.loads(line) for line in file if line.strip()]
+    return [CallMetrics(**row) for row in rows]
+
+
+def percentile(values, p):
+    """
+    The p-th percentile (nearest rank) of a non-empty list of values.
+    """
+    values = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(values)))
+    return values[rank - 1]
+
+
+def summarise_latency(metrics, percentiles=(50, 95, 99)):
+    """
+    Summarise move latency (wall-clock time of "action" calls, including
+    any that exceeded a resource limit or failed) for each player. Returns
+    a dictionary from player names to dictionaries with the number of
+    moves, mean, max and requested percentiles (as "p50" etc.).
+    """
+    latencies = defaultdict(list)
+    for record in metrics:
+        if record.call == "action":
+            latencies[record.player].append(record.wall)
+    summary = {}
+    for player, values in latencies.items():
+        entry = {
+            "moves": len(values),
+            "mean": sum(values) / len(values),
+            "max": max(values),
+        }
+        for p in percentiles:
+            entry[f"p{p}"] = percentile(values, p)
+        summary[player] = entry
+    return summary
+
+
+def report_latency(summary, log):
+    """
+    Print a summary (see summarise_latency) through a StarLog.
+    """
+    log.print("move latency (wall-clock time per action):")
+    for player, entry in summary.items():
+        log.print(
+            f"{player}: {entry['moves']} moves | "
+            f"p50 {entry['p50'] * 1e3:8.2f}ms | "
+            f"p95 {entry['p95'] * 1e3:8.2f}ms | "
+            f"p99 {entry['p99'] * 1e3:8.2f}ms | "
+            f"max {entry['max'] * 1e3:8.2f}ms",
+            depth=1,
+        )
+
+
+def main(argv=None):
+    # (imported here, as referee.options depends on this module)
+    from referee.options import PROGRAM
+
+    parser = argparse.ArgumentParser(
+        prog=f"{PROGRAM} telemetry",
+        description="summarise player metrics files (CSV or JSONL).",
+    )
+    parser.add_argument("paths", metavar="file", nargs="+",
+        help="metrics file written by --telemetry")
+    options = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    metrics = []
+    for path in options.paths:
+        metrics.extend(load(path))
+    report_latency(summarise_latency(metrics), StarLog(level=0))
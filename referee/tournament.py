@@ -0,0 +1,428 @@
+"""
+Headless batch tournament runner: play many games between two or more
+Player classes across a pool of worker processes, streaming per-game
+results to a JSONL file and printing aggregate win rates. Run with:
+
+    python -m referee tournament [options] n player player [player ...]
+
+With two players, they play --games games against each other. With more,
+every pair of players plays --games games (a round robin). Either way,
+colours alternate between games, and each worker process imports each
+player package only once.
+"""
+
+import os
+import sys
+import json
+import math
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from referee.log import config, StarLog
+from referee.game import play, IllegalActionException, BOARD_TYPES
+from referee.player import ResourceLimitException
+from referee.protocol import player_wrapper_class
+from referee.telemetry import RingBuffer, open_sink, load
+from referee.telemetry import summarise_latency, report_latency
+from referee.player import set_space_line, _load_player_class
+from referee.options import package_spec, gc_policy, PROGRAM
+from referee.options import BOARD_DEFAULT, GC_POLICY_DEFAULT
+
+# z value for 95% confidence intervals
+_Z95 = 1.959964
+
+
+def get_options(argv):
+    """Parse and return tournament command-line arguments."""
+    parser = argparse.ArgumentParser(
+        prog=f"{PROGRAM} tournament",
+        description="play a batch of Cachex games between Player classes "
+        "(see `python -m referee --help` for package specifications).",
+    )
+    parser.add_argument(
+        "n",
+        type=int,
+        choices=range(3, 16),
+        help="size of the game board",
+    )
+    parser.add_argument(
+        "players",
+        metavar="player",
+        nargs="+",
+        help="location of a Player class (e.g. package name); give two "
+        "for a match, or more for a round robin",
+    )
+    parser.add_argument(
+        "-g",
+        "--games",
+        type=int,
+        default=10,
+        help="number of games per pair of players (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="number of worker processes (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        metavar="JSONL",
+        default=None,
+        help="stream per-game results to this file, one JSON object per "
+        "line.",
+    )
+    parser.add_argument(
+        "-r",
+        "--records",
+        metavar="DIR",
+        default=None,
+        help="write a binary record of each game to this directory (see "
+        "`python -m referee replay`).",
+    )
+    parser.add_argument(
+        "-T",
+        "--telemetry",
+        metavar="FILE",
+        default=None,
+        help="write metrics for every player call to this file (JSONL, or "
+        "CSV if the name ends in .csv), and report move latency "
+        "percentiles.",
+    )
+    parser.add_argument(
+        "-s",
+        "--space",
+        metavar="space_limit",
+        type=float,
+        default=0,
+        help="limit on memory space (float, MB) for each player.",
+    )
+    parser.add_argument(
+        "-t",
+        "--time",
+        metavar="time_limit",
+        type=float,
+        default=0,
+        help="limit on CPU time (float, seconds) for each player.",
+    )
+    parser.add_argument(
+        "-m",
+        "--move-time",
+        metavar="move_time",
+        type=float,
+        default=0,
+        help="limit on wall-clock time (float, seconds) for each move.",
+    )
+    parser.add_argument(
+        "-w",
+        "--wall-time",
+        metavar="wall_time",
+        type=float,
+        default=0,
+        help="limit on total wall-clock time (float, seconds) for each "
+        "player over a game.",
+    )
+    parser.add_argument(
+        "-b",
+        "--board",
+        choices=BOARD_TYPES,
+        default=BOARD_DEFAULT,
+        help="board representation used by the referee "
+        "(default: %(default)s).",
+    )
+    parser.add_argument(
+        "-i",
+        "--isolate",
+        action="store_true",
+        help="run each player in its own process, with separate time and "
+        "space accounting per player.",
+    )
+    parser.add_argument(
+        "--gc",
+        metavar="GC_POLICY",
+        type=gc_policy,
+        default=GC_POLICY_DEFAULT,
+        help="garbage collection before each player call: always, gen0, "
+        "every:K or off (default: %(default)s).",
+    )
+    args = parser.parse_args(argv)
+    if len(args.players) < 2:
+        parser.error("at least two players are required")
+    return args
+
+
+def schedule(players, games):
+    """
+    List the games to play as (game id, red label, blue label) tuples:
+    `games` games for every pair of players, alternating colours.
+    """
+    fixtures = []
+    for a, b in itertools.combinations(players, 2):
+        for i in range(games):
+            red, blue = (a, b) if i % 2 == 0 else (b, a)
+            fixtures.append((len(fixtures), red, blue))
+    return fixtures
+
+
+def _labels(specs):
+    """
+    Unique display labels for player specs (repeated specs, e.g. for
+    self-play, are numbered).
+    """
+    labels = []
+    for spec in specs:
+        label = spec
+        i = 1
+        while label in labels:
+            i += 1
+            label = f"{spec}#{i}"
+        labels.append(label)
+    return labels
+
+
+# Per-process configuration (set up once per worker, see _init_worker)
+_WORKER = {}
+
+
+def _init_worker(players, n, time_limit, space_limit, board, isolate,
+        gc_policy, records, move_time, wall_time, telemetry):
+    """
+    Worker process initialiser: silence output and import every player
+    class once, before any games are played.
+    """
+    config(level=-1)
+    for pkg, cls in players.values():
+        if cls is not None:  # (not a socket address)
+            _load_player_class(pkg, cls)
+    set_space_line()
+    _WORKER.update(
+        players=players,
+        n=n,
+        time_limit=time_limit,
+        space_limit=space_limit,
+        board_cls=BOARD_TYPES[board],
+        isolate=isolate,
+        gc_policy=gc_policy,
+        records=records,
+        move_time=move_time,
+        wall_time=wall_time,
+        telemetry=telemetry,
+    )
+
+
+def _play_game(fixture):
+    """
+    Play one game in a worker process, returning its result record.
+    """
+    game_id, red, blue = fixture
+    record = {"game": game_id, "red": red, "blue": blue, "n": _WORKER["n"]}
+    metrics = RingBuffer() if _WORKER["telemetry"] else None
+    if _WORKER["records"] is not None:
+        record_filename = os.path.join(_WORKER["records"], f"{game_id}.cxr")
+    else:
+        record_filename = None
+    wrappers = []
+    try:
+        for label in (red, blue):
+            Wrapper = player_wrapper_class(
+                _WORKER["players"][label], _WORKER["isolate"]
+            )
+            wrappers.append(Wrapper(
+                label,
+                _WORKER["players"][label],
+                time_limit=_WORKER["time_limit"],
+                space_limit=_WORKER["space_limit"],
+                gc_policy=_WORKER["gc_policy"],
+                move_time=_WORKER["move_time"],
+                wall_time=_WORKER["wall_time"],
+                telemetry=metrics,
+            ))
+        result = play(
+            wrappers,
+            n=_WORKER["n"],
+            print_state=False,
+            board_cls=_WORKER["board_cls"],
+            record_filename=record_filename,
+        )
+        record["result"] = result
+        if result.startswith("winner: "):
+            record["winner"] = record[result[len("winner: "):]]
+        else:
+            record["winner"] = None
+    except (IllegalActionException, ResourceLimitException) as e:
+        # The game is forfeit by the offending player, where known
+        record["result"] = f"error: {e}"
+        _forfeit(record, {"red": red, "blue": blue}.get(e.player, e.player))
+    except Exception as e:
+        # Any other error is put down to the player whose wrapper raised it
+        # (its own code failing, or its process or connection), including
+        # while the wrapper was being set up, and forfeits the game
+        record["result"] = f"error: {type(e).__name__}: {e}"
+        if len(wrappers) < 2:
+            _forfeit(record, (red, blue)[len(wrappers)])
+        else:
+            _forfeit(record, _offender(e, wrappers))
+    finally:
+        for wrapper in wrappers:
+            wrapper.close()
+    # Wall time spent collecting garbage (off the clock) for each player
+    record["gc_time"] = [wrapper.timer.gc_clock for wrapper in wrappers]
+    if metrics is not None:
+        record["telemetry"] = list(metrics)
+    return record
+
+
+def _forfeit(record, offender):
+    """
+    Record a game as forfeit by the player labelled offender (if it is
+    one of the game's players; otherwise, the game has no winner).
+    """
+    red, blue = record["red"], record["blue"]
+    if offender in (red, blue):
+        record["winner"] = blue if offender == red else red
+    else:
+        record["winner"] = None
+    record["forfeit"] = offender
+
+
+def _offender(error, wrappers):
+    """
+    Label of the player whose wrapper raised error (the innermost wrapper
+    method in its traceback), or None if no wrapper was involved.
+    """
+    offender = None
+    tb = error.__traceback__
+    while tb is not None:
+        caller = tb.tb_frame.f_locals.get("self")
+        for wrapper in wrappers:
+            if caller is wrapper:
+                offender = wrapper.label
+        tb = tb.tb_next
+    return offender
+
+
+def wilson_interval(wins, games, z=_Z95):
+    """
+    Wilson score confidence interval for a win rate of wins / games.
+    """
+    if games == 0:
+        return 0.0, 1.0
+    p = wins / games
+    denom = 1 + z * z / games
+    centre = (p + z * z / (2 * games)) / denom
+    margin = z * math.sqrt(p * (1 - p) / games + z * z / (4 * games ** 2))
+    return centre - margin / denom, centre + margin / denom
+
+
+def summarise(records, labels):
+    """
+    Aggregate per-game result records into per-player statistics. Games
+    without a winner (draws, and errors that can't be blamed on either
+    player) count as draws.
+    """
+    stats = {label: {"games": 0, "wins": 0, "losses": 0, "draws": 0}
+        for label in labels}
+    for record in records:
+        for label in (record["red"], record["blue"]):
+            stats[label]["games"] += 1
+            if record["winner"] is None:
+                stats[label]["draws"] += 1
+            elif record["winner"] == label:
+                stats[label]["wins"] += 1
+            else:
+                stats[label]["losses"] += 1
+    for entry in stats.values():
+        entry["win_rate"] = entry["wins"] / max(entry["games"], 1)
+        entry["ci95"] = wilson_interval(entry["wins"], entry["games"])
+    return stats
+
+
+def run(specs, n, games, jobs=1, output=None, time_limit=0, space_limit=0,
+        board=BOARD_DEFAULT, isolate=False, gc_policy=GC_POLICY_DEFAULT,
+        records=None, move_time=0, wall_time=0, telemetry=None):
+    """
+    Play a tournament between the given player specs, streaming records to
+    the `output` file object (if any), and per-call player metrics to the
+    `telemetry` sink (if any). Returns per-player statistics.
+    """
+    labels = _labels(specs)
+    players = {label: package_spec(spec) for label, spec in zip(labels, specs)}
+    fixtures = schedule(labels, games)
+    initargs = (players, n, time_limit, space_limit, board, isolate,
+        gc_policy, records, move_time, wall_time, telemetry is not None)
+    if records is not None:
+        os.makedirs(records, exist_ok=True)
+
+    records = []
+    if jobs > 1:
+        # (unlike multiprocessing.Pool, these workers are not daemonic, so
+        # they can start processes for isolated players)
+        pool = ProcessPoolExecutor(jobs, initializer=_init_worker,
+            initargs=initargs)
+        futures = [pool.submit(_play_game, fixture) for fixture in fixtures]
+        results = (future.result() for future in as_completed(futures))
+    else:
+        pool = None
+        _init_worker(*initargs)
+        results = map(_play_game, fixtures)
+    try:
+        for record in results:
+            for metrics in record.pop("telemetry", ()):
+                telemetry.write(metrics)
+            records.append(record)
+            if output is not None:
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+    finally:
+        if pool is not None:
+            # (cancel any games not yet started, e.g. after an interrupt)
+            for future in futures:
+                future.cancel()
+            pool.shutdown()
+    return summarise(records, labels)
+
+
+def main(argv=None):
+    options = get_options(sys.argv[1:] if argv is None else argv)
+    output = open(options.output, "w") if options.output else None
+    telemetry = open_sink(options.telemetry) if options.telemetry else None
+    try:
+        stats = run(
+            options.players,
+            options.n,
+            options.games,
+            jobs=options.jobs,
+            output=output,
+            time_limit=options.time,
+            space_limit=options.space,
+            board=options.board,
+            isolate=options.isolate,
+            gc_policy=options.gc,
+            records=options.records,
+            move_time=options.move_time,
+            wall_time=options.wall_time,
+            telemetry=telemetry,
+        )
+    finally:
+        if output is not None:
+            output.close()
+        if telemetry is not None:
+            telemetry.close()
+
+    # (the module-level log may be silenced when playing in this process)
+    log = StarLog(level=0)
+    log.print("tournament results:")
+    for label, entry in stats.items():
+        lo, hi = entry["ci95"]
+        log.print(
+            f"{label}: {entry['wins']}W {entry['losses']}L "
+            f"{entry['draws']}D of {entry['games']} | "
+            f"win rate {entry['win_rate']:6.1%} "
+            f"(95% CI {lo:6.1%} - {hi:6.1%})",
+            depth=1,
+        )
+    if options.telemetry:
+        report_latency(summarise_latency(load(options.telemetry)), log)
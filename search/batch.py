@@ -0,0 +1,172 @@
+"""
+Batch mode for the search program: solve many puzzles across a pool of
+worker processes, streaming one JSON result per line (in input order):
+
+    {"source": ..., "cost": ..., "path": [[r, q], ...], "algorithm": ...,
+     "expanded": ..., "time": ...}
+
+where source names the file (and line, for JSONL input) the puzzle came
+from, cost is the number of hexes on the path (0 if there is none),
+algorithm names the search used (see search.grid.ALGORITHMS), expanded is
+the number of hexes it expanded, and time is how long the search took
+(seconds, including building the grid). A puzzle that cannot be solved
+(e.g. because it is malformed) gets an "error" message instead.
+
+Inputs can be puzzle files (.json), JSONL files with one puzzle per line
+(.jsonl, or '-' for standard input), directories of either, or glob
+patterns matching them. Puzzles are read as they are needed, with only a
+bounded number of them queued for the worker processes at a time, and
+each result is written as soon as it (and every result before it) is
+ready, so standard input can be streamed through the solver.
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import threading
+from functools import partial
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from search.grid import Grid, ALGORITHMS
+
+# Puzzles queued (or being solved) per worker process at a time
+QUEUED = 32
+
+
+def _expand(paths):
+    """
+    List the input files named by paths (files, directories or globs).
+    """
+    files = []
+    for path in paths:
+        if path == "-" or os.path.isfile(path):
+            files.append(path)
+        elif os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.json"))
+                + glob.glob(os.path.join(path, "*.jsonl"))))
+        else:
+            matches = sorted(glob.glob(path))
+            if not matches:
+                raise FileNotFoundError(f"no puzzles found at {path!r}")
+            files.extend(matches)
+    return files
+
+
+def puzzles(paths):
+    """
+    Generate (source, puzzle) pairs from inputs (see module docstring).
+    A puzzle that cannot be parsed is generated as its error message.
+    """
+    for path in _expand(paths):
+        if path == "-" or path.endswith(".jsonl"):
+            file = sys.stdin if path == "-" else open(path)
+            with file:
+                for number, line in enumerate(file, 1):
+                    if line.strip():
+                        yield f"{path}:{number}", _parse(line)
+        else:
+            with open(path) as file:
+                yield path, _parse(file.read())
+
+
+def _parse(text):
+    """
+    Parse a puzzle, or return an error message if it is not valid JSON.
+    """
+    try:
+        return json.loads(text)
+    except ValueError as e:
+        return f"invalid JSON: {e}"
+
+
+def solve(source, puzzle, algorithm="astar"):
+    """
+    Solve a single puzzle with the named search algorithm, returning its
+    result (see module docstring).
+    """
+    search = ALGORITHMS[algorithm]
+    if isinstance(puzzle, str):
+        return {"source": source, "error": puzzle}
+    start = time.perf_counter()
+    try:
+        grid, begin, goal = Grid.from_data(puzzle)
+        path = search(grid, begin, goal)
+    except (KeyError, TypeError, ValueError, IndexError) as e:
+        return {"source": source, "error": f"invalid puzzle: {e!r}"}
+    return {
+        "source": source,
+        "cost": len(path),
+        "path": [list(grid.coords(index)) for index in path],
+        "algorithm": algorithm,
+        "expanded": grid.expanded,
+        "time": time.perf_counter() - start,
+    }
+
+
+def _solve(case, algorithm):
+    return solve(*case, algorithm)
+
+
+def run(paths, jobs=None, out=sys.stdout, algorithm="astar"):
+    """
+    Solve all puzzles from the inputs in paths with the named search
+    algorithm, across jobs worker processes (in this process if jobs is
+    1), writing results to out as they become available (in input order).
+    Returns the number of puzzles solved and the number of errors.
+    """
+    jobs = jobs or os.cpu_count()
+    cases = puzzles(paths)
+    solver = partial(_solve, algorithm=algorithm)
+    counts = {"solved": 0, "errors": 0}
+    if jobs == 1:
+        for result in map(solver, cases):
+            _write(result, out, counts)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            _stream(pool, solver, cases, out, counts, jobs * QUEUED)
+    return counts["solved"], counts["errors"]
+
+
+def _stream(pool, solver, cases, out, counts, window):
+    """
+    Solve cases in a process pool, with at most `window` of them queued or
+    being solved at a time, writing results in input order as they become
+    available (from the pool's result callbacks, so even while waiting for
+    more input).
+    """
+    pending = deque()
+    lock = threading.Lock()
+    slots = threading.Semaphore(window)
+    failures = []
+
+    def write_ready(_):
+        with lock:
+            while pending and pending[0].done():
+                future = pending.popleft()
+                slots.release()
+                try:
+                    _write(future.result(), out, counts)
+                except BaseException as e:  # (e.g. a worker died)
+                    failures.append(e)
+
+    for case in cases:
+        slots.acquire()
+        if failures:
+            break
+        future = pool.submit(solver, case)
+        with lock:
+            pending.append(future)
+        future.add_done_callback(write_ready)
+    # (wait for the last results to be written)
+    pool.shutdown()
+    if failures:
+        raise failures[0]
+
+
+def _write(result, out, counts):
+    out.write(json.dumps(result) + "\n")
+    out.flush()
+    counts["errors" if "error" in result else "solved"] += 1
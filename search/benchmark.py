@@ -0,0 +1,336 @@
+"""
+Benchmark for the A* search in search.hex, comparing it against the
+original search it replaced (which kept its frontier in a plain list, and
+so searched depth-first, ignoring priorities), and against the same search
+over a flat grid (search.grid), and compares the grid's search algorithms
+on open and cluttered boards. Run with:
+
+    python -m search.benchmark [n ...]
+
+to search randomly generated boards of each size n (default: 5, 10, 25,
+50 and 100), reporting the hexes expanded and the time taken by each, and
+the memory each representation takes per hex.
+
+Run with --suite to instead solve a suite of puzzles with every engine
+(see ENGINES): puzzles generated by search.generate (seeded, so the suite
+is the same from run to run), or read from --input files as in search
+batch mode. For each board size it reports, per engine, the puzzles
+solved, the mean time (building the board and searching it), the mean
+hexes expanded and the peak memory allocated, and checks that every
+engine finds paths of the same cost. --output also writes the report as
+JSON, to compare against after changing the search code.
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+from collections import defaultdict
+
+from search import generate
+from search.hex import Board
+from search.grid import Grid, ALGORITHMS
+from search.batch import puzzles
+
+SIZES = [5, 10, 25, 50, 100]
+
+
+def _random_board(n, rng, blocked=0.3):
+    """
+    Board with roughly `blocked` of its hexes blocked, and a random start
+    and goal (as main builds them from an input file).
+    """
+    cells = [(i, j) for i in range(n) for j in range(n)]
+    start, goal = rng.sample(cells, 2)
+    board_dict = {}
+    for cell in cells:
+        if cell == start:
+            board_dict[cell] = "Start"
+        elif cell == goal:
+            board_dict[cell] = "Goal"
+        elif rng.random() < blocked:
+            board_dict[cell] = rng.choice(("b", "r"))
+        else:
+            board_dict[cell] = str(cell[0]) + ',' + str(cell[1])
+    return Board(n, board_dict)
+
+
+def _grid(board):
+    """
+    Grid (and start and goal indices) equivalent to a Board.
+    """
+    n = board.size
+    grid = Grid(n, (coords for coords, hex in board.hexes.items()
+        if hex.value == "b" or hex.value == "r"))
+    start, goal = (grid.index(*hex.get_coords())
+        for hex in (board.start, board.goal))
+    return grid, start, goal
+
+
+def _bytes_per_hex(build, n):
+    """
+    Memory allocated (bytes per hex) by build() for a board of size n.
+    """
+    tracemalloc.start()
+    board = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / (n * n)
+
+
+def _legacy_a_star(board):
+    """
+    Original Board.a_star: the frontier is a list, and solution.pop()
+    takes the most recently added hex, whatever its priority. Returns the
+    number of hexes expanded.
+    """
+    expanded = 0
+    solution = []
+    coords = board.start.get_coords()
+    solution.append((coords, 0))
+    came_from = {}
+    cost_so_far = {}
+    came_from[coords] = None
+    cost_so_far[coords] = 0
+
+    while len(solution) > 0:
+        current = solution.pop()
+        current_coords = current[0]
+        expanded += 1
+        if current_coords == board.goal.get_coords():
+            break
+
+        for next in board.hexes[current_coords].get_neighbours():
+            if next.value == "b" or next.value == "r":
+                continue
+            new_cost = cost_so_far[current_coords] + \
+                board.hexes[current_coords].distance(next)
+            if next.get_coords() not in cost_so_far or \
+                    new_cost < cost_so_far[next.get_coords()]:
+                cost_so_far[next.get_coords()] = new_cost
+                priority = new_cost + next.heuristic()
+                solution.append((next.get_coords(), priority))
+                came_from[next.get_coords()] = current_coords
+
+    board.came_from, board.cost_so_far = came_from, cost_so_far
+    return expanded
+
+
+def bench(n, boards=20, seed=0):
+    """
+    Search `boards` random boards of size n with both searches, reporting
+    the total hexes expanded and time taken by each.
+    """
+    rng = random.Random(seed)
+    cases = [_random_board(n, rng) for _ in range(boards)]
+
+    start = time.perf_counter()
+    old_expanded = sum(_legacy_a_star(board) for board in cases)
+    old = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new_expanded = 0
+    for board in cases:
+        board.a_star()
+        new_expanded += board.expanded
+    new = time.perf_counter() - start
+
+    grids = [_grid(board) for board in cases]
+    start = time.perf_counter()
+    grid_expanded = 0
+    for grid, source, goal in grids:
+        grid.a_star(source, goal)
+        grid_expanded += grid.expanded
+    flat = time.perf_counter() - start
+
+    print(
+        f"n = {n:3d}: {boards} boards | "
+        f"old {old_expanded / boards:9.1f} expanded "
+        f"{old / boards * 1e3:9.2f}ms | "
+        f"new {new_expanded / boards:9.1f} expanded "
+        f"{new / boards * 1e3:9.2f}ms | "
+        f"speedup {old / new:6.2f}x"
+    )
+    board_bytes = _bytes_per_hex(lambda: _random_board(n, rng), n)
+    grid_bytes = _bytes_per_hex(lambda: _grid(cases[0])[0], n)
+    print(
+        f"         grid: "
+        f"{grid_expanded / boards:9.1f} expanded {flat / boards * 1e3:9.2f}ms "
+        f"(speedup over board {new / flat:5.2f}x) | "
+        f"{board_bytes:7.1f} bytes/hex as a Board, "
+        f"{grid_bytes:5.1f} as a Grid"
+    )
+
+
+def bench_algorithms(n, blocked, boards=20, seed=0):
+    """
+    Search `boards` random grids of size n with roughly `blocked` of their
+    hexes blocked using each algorithm in search.grid.ALGORITHMS,
+    reporting the total hexes expanded and time taken by each.
+    """
+    rng = random.Random(seed)
+    grids = [_grid(_random_board(n, rng, blocked)) for _ in range(boards)]
+    results = []
+    for name, search in ALGORITHMS.items():
+        expanded = 0
+        start = time.perf_counter()
+        for grid, source, goal in grids:
+            search(grid, source, goal)
+            expanded += grid.expanded
+        elapsed = time.perf_counter() - start
+        results.append(f"{name} {expanded / boards:9.1f} expanded "
+            f"{elapsed / boards * 1e3:8.2f}ms")
+    print(f"         {blocked:4.0%} blocked: " + " | ".join(results))
+
+
+def _board_engine(data):
+    """
+    Solve a puzzle with search.hex.Board (as main used to), returning the
+    cost of the path found and the number of hexes expanded.
+    """
+    board_dict = {(r, q): value for value, r, q in data["board"]}
+    board_dict[tuple(data["start"])] = "Start"
+    board_dict[tuple(data["goal"])] = "Goal"
+    board = Board(data["n"], board_dict)
+    board.a_star()
+    board.reconstruct_path(board.came_from, board.start.get_coords(),
+        board.goal.get_coords())
+    return len(board.solution), board.expanded
+
+
+def _grid_engine(algorithm):
+    """
+    Engine solving a puzzle over a search.grid.Grid with the named
+    algorithm.
+    """
+    search = ALGORITHMS[algorithm]
+
+    def engine(data):
+        grid, start, goal = Grid.from_data(data)
+        return len(search(grid, start, goal)), grid.expanded
+    return engine
+
+
+# Search engines compared by the suite, by name (each is called as
+# engine(data) with a parsed puzzle, returning its cost and hexes expanded)
+ENGINES = {
+    "board": _board_engine,
+    "grid": _grid_engine("astar"),
+    "bidirectional": _grid_engine("bidirectional"),
+}
+
+
+def _peak_bytes(engine, data):
+    """
+    Peak memory allocated (bytes) while engine solves a puzzle.
+    """
+    tracemalloc.start()
+    engine(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def suite(cases, engines=ENGINES):
+    """
+    Solve each puzzle in cases with every engine, returning a report: for
+    each board size (in increasing order), the number of puzzles and
+    mismatches (puzzles the engines found paths of different costs for),
+    and for each engine the puzzles solved and the mean time (seconds),
+    hexes expanded and peak memory (bytes).
+    """
+    buckets = defaultdict(lambda: {"puzzles": 0, "mismatches": 0,
+        "engines": {name: defaultdict(float) for name in engines}})
+    for data in cases:
+        bucket = buckets[data["n"]]
+        bucket["puzzles"] += 1
+        costs = set()
+        for name, engine in engines.items():
+            stats = bucket["engines"][name]
+            start = time.perf_counter()
+            cost, expanded = engine(data)
+            stats["time"] += time.perf_counter() - start
+            stats["expanded"] += expanded
+            stats["memory"] += _peak_bytes(engine, data)
+            stats["solved"] += cost > 0
+            costs.add(cost)
+        bucket["mismatches"] += len(costs) > 1
+
+    report = {}
+    for n in sorted(buckets):
+        bucket = buckets[n]
+        count = bucket["puzzles"]
+        report[n] = {
+            "puzzles": count,
+            "mismatches": bucket["mismatches"],
+            "engines": {name: {
+                "solved": int(stats["solved"]),
+                "time": stats["time"] / count,
+                "expanded": stats["expanded"] / count,
+                "memory": stats["memory"] / count,
+            } for name, stats in bucket["engines"].items()},
+        }
+    return report
+
+
+def _print_report(report):
+    for n, bucket in report.items():
+        print(f"n = {n:3d}: {bucket['puzzles']} puzzles, "
+            f"{bucket['mismatches']} cost mismatches")
+        for name, stats in bucket["engines"].items():
+            print(
+                f"    {name:>14}: {stats['solved']:4d} solved | "
+                f"{stats['time'] * 1e3:9.2f}ms "
+                f"{stats['expanded']:9.1f} expanded "
+                f"{stats['memory'] / 1024:9.1f}KiB peak"
+            )
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog="python3 -m search.benchmark",
+        description="benchmark the search on random boards, or (with "
+        "--suite) every search engine over a suite of puzzles.",
+    )
+    parser.add_argument("sizes", metavar="n", type=int, nargs="*",
+        help="board sizes (default: %s)." % SIZES)
+    parser.add_argument("--suite", action="store_true",
+        help="run the suite of puzzles through every engine.")
+    parser.add_argument("-s", "--seed", type=int, default=0,
+        help="random seed for the generated suite (default: %(default)s).")
+    parser.add_argument("-c", "--count", type=int, default=2,
+        help="generated puzzles per size, density and placement "
+        "(default: %(default)s).")
+    parser.add_argument("-i", "--input", action="append",
+        help="solve the puzzles in these inputs (as in batch mode) "
+        "instead of generating them.")
+    parser.add_argument("-o", "--output",
+        help="also write the suite's report to this file, as JSON.")
+    options = parser.parse_args(argv)
+    sizes = options.sizes or SIZES
+
+    if not options.suite:
+        for n in sizes:
+            bench(n)
+            for blocked in (0.05, 0.3):
+                bench_algorithms(n, blocked)
+        return
+
+    if options.input:
+        cases = (data for _, data in puzzles(options.input)
+            if not isinstance(data, str))
+    else:
+        cases = generate.puzzles(options.seed, sizes, count=options.count)
+    report = suite(cases)
+    _print_report(report)
+    if options.output:
+        with open(options.output, "w") as file:
+            json.dump(report, file, indent=4)
+    if any(bucket["mismatches"] for bucket in report.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
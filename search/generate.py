@@ -0,0 +1,137 @@
+"""
+Seeded generator of Part A puzzles (boards in the input.json format), for
+testing and benchmarking the search. Puzzles vary in size, in obstacle
+density and in where the start and goal are placed (see PLACEMENTS), and
+some are made unsolvable by walling in the goal. Run with:
+
+    python -m search.generate [--seed S] [--sizes n ...] [--count K] \
+        > puzzles.jsonl
+
+to write puzzles as JSONL (one per line), which search batch mode and
+search.benchmark --suite both read. The same seed always gives the same
+puzzles.
+"""
+
+import sys
+import json
+import random
+import argparse
+
+from search.hex import HEX_STEPS
+
+SIZES = [5, 10, 25, 50, 100]
+
+# Fractions of hexes blocked
+DENSITIES = [0.0, 0.1, 0.3, 0.5]
+
+# Start and goal placements: anywhere, on opposite edges, in opposite
+# corners (as far apart as the board allows), or a few steps apart
+PLACEMENTS = ("random", "edges", "corners", "near")
+
+# Fraction of puzzles made unsolvable (by blocking every hex around the goal)
+UNSOLVABLE = 0.1
+
+# Greatest distance between start and goal for "near" placements
+NEAR = 3
+
+
+def _distance(a, b):
+    dr, dq = a[0] - b[0], a[1] - b[1]
+    return (abs(dr) + abs(dq) + abs(dr + dq)) // 2
+
+
+def _place(n, placement, rng):
+    """
+    Start and goal coordinates (distinct) for a board of size n.
+    """
+    last = n - 1
+    if placement == "edges":
+        return (0, rng.randrange(n)), (last, rng.randrange(n))
+    if placement == "corners":
+        return rng.choice((((0, 0), (last, last)), ((last, last), (0, 0))))
+    if placement == "near":
+        start = (rng.randrange(n), rng.randrange(n))
+        rows = range(max(start[0] - NEAR, 0), min(start[0] + NEAR + 1, n))
+        cols = range(max(start[1] - NEAR, 0), min(start[1] + NEAR + 1, n))
+        goals = [(r, q) for r in rows for q in cols
+            if 0 < _distance(start, (r, q)) <= NEAR]
+        return start, rng.choice(goals)
+    if placement == "random":
+        cells = [(r, q) for r in range(n) for q in range(n)]
+        return tuple(rng.sample(cells, 2))
+    raise ValueError(f"unknown placement {placement!r}")
+
+
+def puzzle(n, density=0.3, placement="random", unsolvable=False, rng=random):
+    """
+    Generate a puzzle on a board of size n (at least 2), with roughly
+    `density` of its other hexes blocked. If unsolvable, every hex around
+    the goal is blocked too (otherwise the puzzle may or may not have a
+    solution, depending on how the blocked hexes fall).
+    """
+    if n < 2:
+        raise ValueError("boards must be at least 2 hexes across")
+    start, goal = _place(n, placement, rng)
+    while unsolvable and _distance(start, goal) < 2:
+        start, goal = _place(n, placement, rng)
+
+    blocked = {(r, q) for r in range(n) for q in range(n)
+        if rng.random() < density} - {start, goal}
+    if unsolvable:
+        blocked.update((goal[0] + dr, goal[1] + dq) for dr, dq in HEX_STEPS
+            if 0 <= goal[0] + dr < n and 0 <= goal[1] + dq < n)
+    return {
+        "n": n,
+        "board": [[rng.choice("rb"), r, q] for r, q in sorted(blocked)],
+        "start": list(start),
+        "goal": list(goal),
+    }
+
+
+def puzzles(seed=0, sizes=SIZES, densities=DENSITIES, placements=PLACEMENTS,
+        count=2, unsolvable=UNSOLVABLE):
+    """
+    Generate `count` puzzles for each combination of size, density and
+    placement, making roughly `unsolvable` of them unsolvable.
+    """
+    rng = random.Random(seed)
+    for n in sizes:
+        for density in densities:
+            for placement in placements:
+                for _ in range(count):
+                    yield puzzle(n, density, placement,
+                        rng.random() < unsolvable, rng)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog="python3 -m search.generate",
+        description="write seeded random puzzles to standard output as "
+        "JSONL (one input.json puzzle per line).",
+    )
+    parser.add_argument("-s", "--seed", type=int, default=0,
+        help="random seed (default: %(default)s).")
+    parser.add_argument("-n", "--sizes", type=int, nargs="+", default=SIZES,
+        help="board sizes (default: %(default)s).")
+    parser.add_argument("-d", "--densities", type=float, nargs="+",
+        default=DENSITIES,
+        help="fractions of hexes blocked (default: %(default)s).")
+    parser.add_argument("-p", "--placements", nargs="+", choices=PLACEMENTS,
+        default=PLACEMENTS,
+        help="start and goal placements (default: all).")
+    parser.add_argument("-c", "--count", type=int, default=2,
+        help="puzzles per size, density and placement "
+        "(default: %(default)s).")
+    parser.add_argument("-u", "--unsolvable", type=float, default=UNSOLVABLE,
+        help="fraction of puzzles made unsolvable (default: %(default)s).")
+    options = parser.parse_args(argv)
+    if min(options.sizes) < 2:
+        parser.error("sizes must be at least 2")
+
+    for data in puzzles(options.seed, options.sizes, options.densities,
+            options.placements, options.count, options.unsolvable):
+        sys.stdout.write(json.dumps(data) + "\n")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
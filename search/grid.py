@@ -0,0 +1,179 @@
+"""
+A compact alternative to search.hex.Board: the grid is a flat bytearray
+with one byte per hex, hex (r, q) is identified by its index r * n + q,
+and neighbour indices are precomputed once per board size. Search
+bookkeeping (costs, parents, the closed set) is kept in flat arrays of
+ints, so a grid costs a handful of bytes per hex rather than a Hexagon
+object (with its own dict and neighbour list) per hex.
+
+Two search algorithms are available (see ALGORITHMS): A*, and a
+bidirectional (meet-in-the-middle) breadth-first search, which can expand
+far fewer hexes on large, open boards.
+"""
+
+from array import array
+from functools import lru_cache
+from heapq import heappush, heappop
+
+from search.hex import HEX_STEPS
+
+# Hex contents
+FREE = 0
+BLOCKED = 1
+
+
+@lru_cache(maxsize=None)
+def neighbour_table(n):
+    """
+    Indices of the (in bounds) neighbours of each hex index, for a board
+    of size n (computed once per size).
+    """
+    table = []
+    for r in range(n):
+        for q in range(n):
+            table.append(tuple((r + dr) * n + q + dq for dr, dq in HEX_STEPS
+                if 0 <= r + dr < n and 0 <= q + dq < n))
+    return table
+
+
+class Grid:
+    """
+    A board of size n with some hexes blocked, searchable with A* (see
+    search.hex.Board.a_star, which this mirrors) or bidirectional search.
+    Counts the hexes expanded and generated by the last search.
+    """
+
+    def __init__(self, n, blocked=()):
+        self.n = n
+        self.cells = bytearray(n * n)
+        for r, q in blocked:
+            self.cells[r * n + q] = BLOCKED
+        self.expanded = 0
+        self.generated = 0
+
+    @classmethod
+    def from_data(cls, data):
+        """
+        Build a grid from a parsed input file, returning it along with the
+        start and goal hex indices.
+        """
+        n = data["n"]
+        grid = cls(n, ((r, q) for _, r, q in data["board"]))
+        start, goal = (r * n + q for r, q in (data["start"], data["goal"]))
+        return grid, start, goal
+
+    def index(self, r, q):
+        """Index of hex (r, q)."""
+        return r * self.n + q
+
+    def coords(self, index):
+        """Coordinates (r, q) of a hex index."""
+        return divmod(index, self.n)
+
+    def distance(self, a, b):
+        """
+        Hex distance between two hex indices (the fewest steps between
+        them on an empty board).
+        """
+        ar, aq = divmod(a, self.n)
+        br, bq = divmod(b, self.n)
+        dr, dq = ar - br, aq - bq
+        return (abs(dr) + abs(dq) + abs(dr + dq)) // 2
+
+    def a_star(self, start, goal):
+        """
+        Find a shortest path from start to goal (hex indices), returning it
+        as a list of hex indices (empty if there is no path).
+        """
+        cells, neighbours = self.cells, neighbour_table(self.n)
+        size = self.n * self.n
+        cost_so_far = array("i", [-1]) * size
+        came_from = array("i", [-1]) * size
+        closed = bytearray(size)
+
+        cost_so_far[start] = 0
+        frontier = [(self.distance(start, goal), 0, start)]
+        self.expanded, self.generated = 0, 1
+        while frontier:
+            _, _, current = heappop(frontier)
+            if closed[current]:
+                continue  # (stale entry for a hex already expanded)
+            closed[current] = 1
+            self.expanded += 1
+            if current == goal:
+                break
+            new_cost = cost_so_far[current] + 1
+            for next in neighbours[current]:
+                if cells[next] or closed[next]:
+                    continue
+                if cost_so_far[next] < 0 or new_cost < cost_so_far[next]:
+                    cost_so_far[next] = new_cost
+                    came_from[next] = current
+                    heappush(frontier, (new_cost + self.distance(next, goal),
+                        -new_cost, next))
+                    self.generated += 1
+        else:
+            return []
+
+        path = [goal]
+        while path[-1] != start:
+            path.append(came_from[path[-1]])
+        path.reverse()
+        return path
+
+    def bidirectional(self, start, goal):
+        """
+        Find a shortest path from start to goal (hex indices) by
+        breadth-first search from both ends, returning it as a list of hex
+        indices (empty if there is no path).
+
+        Each step expands a whole layer of the side with the smaller
+        frontier. Once that layer reaches hexes seen from the other side,
+        the best meeting hex among them lies on a shortest path.
+        """
+        cells, neighbours = self.cells, neighbour_table(self.n)
+        size = self.n * self.n
+        distance = (array("i", [-1]) * size, array("i", [-1]) * size)
+        came_from = (array("i", [-1]) * size, array("i", [-1]) * size)
+        distance[0][start] = distance[1][goal] = 0
+        layers = [[start], [goal]]
+        self.expanded, self.generated = 0, 2
+        if start == goal:
+            return [start]
+
+        meet = -1
+        while layers[0] and layers[1] and meet < 0:
+            side = 0 if len(layers[0]) <= len(layers[1]) else 1
+            own, other = distance[side], distance[1 - side]
+            parents = came_from[side]
+            best = size
+            following = []
+            for current in layers[side]:
+                self.expanded += 1
+                for next in neighbours[current]:
+                    if cells[next] or own[next] >= 0:
+                        continue
+                    own[next] = own[current] + 1
+                    parents[next] = current
+                    following.append(next)
+                    self.generated += 1
+                    if other[next] >= 0 and own[next] + other[next] < best:
+                        best, meet = own[next] + other[next], next
+            layers[side] = following
+        if meet < 0:
+            return []
+
+        path = [meet]
+        while path[-1] != start:
+            path.append(came_from[0][path[-1]])
+        path.reverse()
+        while path[-1] != goal:
+            path.append(came_from[1][path[-1]])
+        return path
+
+
+# Search algorithms, by name (each is called as algorithm(grid, start, goal))
+ALGORITHMS = {
+    "astar": Grid.a_star,
+    "bidirectional": Grid.bidirectional,
+}
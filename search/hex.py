@@ -1,3 +1,10 @@
+from heapq import heappush, heappop
+
+from search.util import print_coordinate
+
+# Axial coordinate steps to each of a hexagon's six neighbours
+HEX_STEPS = [(0, 1), (1, 0), (1, -1), (0, -1), (-1, 0), (-1, 1)]
+
 # Class that represents a hexagonal grid board
 class Board:
     def __init__(self, size, input=None):
@@ -9,6 +16,8 @@ class Board:
         self.came_from = None
         self.cost_so_far = {}
         self.solution = []
+        self.expanded = 0
+        self.generated = 0
         for i in range(size):
             for j in range(size):
                 if (i, j) in input:
@@ -51,36 +60,47 @@ class Board:
                     self.hexes[i, j].value = str(self.hexes[i, j].get_coords()[0]) + ',' + str(self.hexes[i, j].get_coords()[1])
 
     # Function to implement A* search algorithm - adapted from https://www.redblobgames.com/pathfinding/a-star/introduction.html
+    # The frontier is a binary heap ordered by priority (cost so far plus hex distance to the goal), ties going to
+    # the deeper node. Instead of decreasing the priority of a queued hex, it is pushed again, and stale entries are
+    # skipped once the hex is in the closed set. Counts hexes expanded (popped and closed) and generated (pushed)
     def a_star(self):
-        solution = []
         coords = self.start.get_coords()
-        solution.append((coords, 0))
+        goal_coords = self.goal.get_coords()
+        frontier = [(self.start.heuristic(), 0, coords)]
         came_from = {}
         cost_so_far = {}
         came_from[coords] = None
         cost_so_far[coords] = 0
+        closed = set()
+        self.expanded, self.generated = 0, 1
 
-        while len(solution) > 0:
-            current = solution.pop()
-            current_coords = current[0]
-            if current_coords == self.goal.get_coords():
+        while len(frontier) > 0:
+            _, _, current_coords = heappop(frontier)
+            if current_coords in closed:
+                continue
+            closed.add(current_coords)
+            self.expanded += 1
+            if current_coords == goal_coords:
                 break
 
             for next in self.hexes[current_coords].get_neighbours():
-                next.board = self
-                if next.value == "b" or next.value == "r":
+                if next.value == "b" or next.value == "r" or next.get_coords() in closed:
                     continue
                 new_cost = cost_so_far[current_coords] + self.hexes[current_coords].distance(next)
                 if next.get_coords() not in cost_so_far or new_cost < cost_so_far[next.get_coords()]:
                     cost_so_far[next.get_coords()] = new_cost
                     priority = new_cost + next.heuristic()
-                    solution.append((next.get_coords(), priority))
+                    heappush(frontier, (priority, -new_cost, next.get_coords()))
+                    self.generated += 1
                     came_from[next.get_coords()] = current_coords
 
         self.came_from, self.cost_so_far = came_from, cost_so_far
 
     # Function to reconstruct path - adapted from https://www.redblobgames.com/pathfinding/a-star/implementation.html
     def reconstruct_path(self, came_from, start, goal):
+        if goal not in came_from:
+            self.solution = []
+            return
         current = goal
         path = []
         while current != start:
@@ -90,12 +110,11 @@ class Board:
         path.reverse()
         self.solution = path
 
+    # The cost printed is the number of hexes on the path (start and goal included), or 0 if there is none
     def output_solution(self):
-        if len(self.cost_so_far) == 0:
-            return 0
-        print(self.cost_so_far[self.goal.get_coords()])
+        print(len(self.solution))
         for i in range(len(self.solution)):
-            print(self.solution[i])
+            print_coordinate(*self.solution[i])
 
 # Class that represents a hexagon
 class Hexagon:
@@ -126,33 +145,26 @@ class Hexagon:
 
     # Function to check if hexagon is a neighbour
     def is_neighbour(self, hex) -> bool:
-        return abs(self.x - hex.x) + abs(self.y - hex.y) == 1 and hex.in_bounds(self.board.size)
+        return self.distance(hex) == 1 and hex.in_bounds(self.board.size)
     
     # Function to return coordinates of hexagon as a tuple
     def get_coords(self):
         return self.x, self.y
 
-    # Function to find the distance between two hexagons
+    # Function to find the (hex) distance between two hexagons, the fewest steps between them on an empty board
     def distance(self, hex) -> int:
-        return abs(self.x - hex.x) + abs(self.y - hex.y)
+        dx, dy = self.x - hex.x, self.y - hex.y
+        return (abs(dx) + abs(dy) + abs(dx + dy)) // 2
 
     # Heuristic function to find the distance between self and the goal hexagon
     def heuristic(self) -> int:
         return self.distance(self.board.goal)
 
-    # Function to find neighbours for hexagon
+    # Function to find neighbours for hexagon (the board's own hexagons, so their values can be checked)
     def get_neighbours(self):
-        if self.in_bounds(self.board.size):
-            if self.is_neighbour(self + Hexagon(0, 1)):
-                self.neighbours.append(self + Hexagon(0, 1))
-            if self.is_neighbour(self + Hexagon(1, 0)):
-                self.neighbours.append(self + Hexagon(1, 0))
-            if self.is_neighbour(self + Hexagon(1, -1)):
-                self.neighbours.append(self + Hexagon(1, -1))
-            if self.is_neighbour(self + Hexagon(0, -1)):
-                self.neighbours.append(self + Hexagon(0, -1))
-            if self.is_neighbour(self + Hexagon(-1, 0)):
-                self.neighbours.append(self + Hexagon(-1, 0))
-            if self.is_neighbour(self + Hexagon(-1, 1)):
-                self.neighbours.append(self + Hexagon(-1, 1))
-        return self.neighbours
\ No newline at end of file
+        self.neighbours = []
+        for dx, dy in HEX_STEPS:
+            coords = (self.x + dx, self.y + dy)
+            if coords in self.board.hexes:
+                self.neighbours.append(self.board.hexes[coords])
+        return self.neighbours
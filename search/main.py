@@ -6,22 +6,82 @@ This script contains the entry point to the program (the code in
 `__main__.py` calls `main()`). Your solution starts here!
 """
 
+import os
 import sys
 import json
+import argparse
 
 # If you want to separate your code into separate files, put them
 # inside the `search` directory (like this one and `util.py`) and
 # then import from them like this:
 from search.util import print_board, print_coordinate
-from search.hex import Hexagon, Board
+from search.grid import Grid, ALGORITHMS
+from search import batch
+
+def get_options(argv):
+    """Parse and return command-line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="python3 -m search",
+        description="find a shortest path across a Cachex board (or, in "
+        "batch mode, across many boards).",
+    )
+    parser.add_argument(
+        "inputs",
+        metavar="input",
+        nargs="+",
+        help="path to an input.json file (in batch mode: input files, "
+        ".jsonl files with one puzzle per line, directories of either, "
+        "glob patterns, or '-' to read JSONL from standard input)",
+    )
+    parser.add_argument(
+        "-b",
+        "--batch",
+        action="store_true",
+        help="solve all puzzles, writing results to standard output as "
+        "JSONL (see search.batch).",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="number of worker processes in batch mode "
+        "(default: %(default)s).",
+    )
+    parser.add_argument(
+        "-a",
+        "--algorithm",
+        choices=sorted(ALGORITHMS),
+        default="astar",
+        help="search algorithm: A*, or breadth-first search from both ends "
+        "(often faster on large, open boards) (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-s",
+        "--stats",
+        action="store_true",
+        help="report the number of hexes expanded by the search to "
+        "standard error (batch mode always reports it).",
+    )
+    options = parser.parse_args(argv)
+    if not options.batch and len(options.inputs) > 1:
+        parser.error("multiple inputs are only supported in batch mode")
+    return options
+
 
 def main():
-    try:
-        with open(sys.argv[1]) as file:
-            data = json.load(file)
-    except IndexError:
-        print("usage: python3 -m search path/to/input.json", file=sys.stderr)
-        sys.exit(1)
+    options = get_options(sys.argv[1:])
+    if options.batch:
+        try:
+            _, errors = batch.run(options.inputs, options.jobs,
+                algorithm=options.algorithm)
+        except FileNotFoundError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+        sys.exit(1 if errors else 0)
+
+    with open(options.inputs[0]) as file:
+        data = json.load(file)
 
     # TODO:
     # Find and print a solution to the board configuration described
@@ -31,36 +91,16 @@ def main():
     # usage information).
     
     # Start solution
-    # Convert board from data into dict with coords as keys and values as values
-    board_dict = {}
-    for i in data["board"]:
-        board_dict[i[1], i[2]] = i[0]
-
-    # Retrieve start and goal coords from data
-    start = data["start"]
-    goal = data["goal"]
-    
-    # Add start and goal coords to board_dict
-    board_dict[start[0], start[1]] = "Start"
-    board_dict[goal[0], goal[1]] = "Goal"
-    
-    # Put placeholder values in every other hex
-    for i in range(data["n"]):
-        for j in range(data["n"]):
-            if (i, j) not in board_dict:
-                board_dict[i, j] = str(i) + ',' + str(j)
-
-    # Convert to a 2D array of Hexagons to represent the game board
-    game_board = Board(data["n"], board_dict)
-
-    # Run a star algorithm over game board 
-    game_board.a_star()
-
-    # Reconstruct solution path from a star algorithm
-    game_board.reconstruct_path(game_board.came_from, game_board.start.get_coords(), game_board.goal.get_coords())
-    # print_board(data["n"], game_board.convert(), "ANSI = True", True)
-    
-    # Output solution
-    game_board.output_solution()
+    # Convert board from data into a flat grid of hexes, with start and goal as hex indices
+    grid, start, goal = Grid.from_data(data)
 
+    # Run the chosen search algorithm (A* by default) over the grid
+    path = ALGORITHMS[options.algorithm](grid, start, goal)
+    if options.stats:
+        print(f"{options.algorithm}: expanded {grid.expanded} hexes, "
+            f"generated {grid.generated}", file=sys.stderr)
 
+    # Output solution (number of hexes on the path, then each hex on it, or 0 if there is no path)
+    print(len(path))
+    for index in path:
+        print_coordinate(*grid.coords(index))